@@ -0,0 +1,248 @@
+import os
+import math
+import time
+import collections
+import pygame
+import Globals
+import UIElements
+import DataStructures
+
+# What is timed for every page, in the order the columns are printed.
+METRICS = ('turnPage', 'takeParagraphs', '_splitLines', 'render')
+# How many times each page is built and drawn, unless --repeat says otherwise.
+REPEAT = 5
+# How many of the slowest pages are flagged in the report.
+SLOWEST = 5
+
+
+def run(app, args=()):
+	"""Crawl every Story with the given App, and print a report of where page construction time goes.  The App must be headless."""
+	repeat = REPEAT
+	if '--repeat' in args:
+		repeat = int(args[list(args).index('--repeat') + 1])
+	# Builds start from empty caches, as a page turned to for the first time does, unless --warm is given.
+	warm = '--warm' in args
+
+	# Every page must be built by turnPage itself, where it can be timed.
+	Globals.PREFETCH = False
+
+	app.on_init()
+	crawler = StoryCrawler(app)
+	crawler.crawl(repeat, warm)
+	printReport(crawler)
+	app.on_cleanup()
+
+
+def percentile(values, fraction):
+	"""Return the nearest-rank percentile of a list of numbers, where fraction is between 0 and 1."""
+	ordered = sorted(values)
+	return ordered[max(0, int(math.ceil(fraction * len(ordered))) - 1)]
+
+
+def printReport(crawler):
+	"""Print the p50 and p95 of every metric for every page, flag the slowest pages, and list any pages which could not be built."""
+	names = ['{0}:{1}'.format(storyName, pageName) for storyName, pageName in crawler.timings]
+	nameWidth = max([len(name) for name in names] + [len('Page')])
+
+	# A page's cost is how long it takes from the click to the first frame.
+	def cost(key):
+		return percentile(crawler.timings[key]['turnPage'], 0.5) + percentile(crawler.timings[key]['render'], 0.5)
+	slowest = sorted(crawler.timings, key=cost, reverse=True)[:SLOWEST]
+
+	if crawler.warm:
+		caches = 'the caches kept warm from build to build'
+	else:
+		caches = 'the font, layout and render caches emptied before each build'
+	print('Times are in milliseconds, over {0} builds of each page, with {1}.  * marks the {2} slowest pages.'.format(crawler.repeat, caches, SLOWEST))
+	print('  ' + 'Page'.ljust(nameWidth) + ''.join('{0:>20}'.format(metric) for metric in METRICS))
+	print('  ' + ''.ljust(nameWidth) + ''.join('{0:>10}{1:>10}'.format('p50', 'p95') for metric in METRICS))
+	for name, key in zip(names, crawler.timings):
+		columns = ''
+		for metric in METRICS:
+			values = crawler.timings[key][metric]
+			if values:
+				columns += '{0:>10.2f}{1:>10.2f}'.format(percentile(values, 0.5), percentile(values, 0.95))
+			else:
+				columns += '{0:>10}{1:>10}'.format('-', '-')
+		flag = '*' if key in slowest else ' '
+		print(flag + ' ' + name.ljust(nameWidth) + columns)
+
+	# The same percentiles over every build of every page.
+	columns = ''
+	for metric in METRICS:
+		values = [value for timing in crawler.timings.values() for value in timing[metric]]
+		if values:
+			columns += '{0:>10.2f}{1:>10.2f}'.format(percentile(values, 0.5), percentile(values, 0.95))
+		else:
+			columns += '{0:>10}{1:>10}'.format('-', '-')
+	print('  ' + 'All pages'.ljust(nameWidth) + columns)
+
+	print('')
+	print('Slowest pages:')
+	for key in slowest:
+		print('  {0}:{1}  {2:.2f} ms from turnPage to the first frame'.format(key[0], key[1], cost(key)))
+
+	if crawler.failures:
+		print('')
+		print('Pages which could not be built:')
+		for (storyName, pageName), message in crawler.failures.items():
+			print('  {0}:{1}  {2}'.format(storyName, pageName, message))
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class StoryCrawler:
+	"""
+	The class for visiting every page of every Story, and timing how long each one takes to show.
+
+	The crawl starts at the "start" page of every story file in the Stories folder, and follows
+	every button and input transition from there, including jumps into other stories.  Each page is
+	turned to with App.turnPage and then drawn with App.on_render, repeat times over.  A long page
+	shows its first paragraphs straight away and prepares the rest on later frames, so after the
+	first frame the rest are prepared too.  While the crawl runs, StoryPage.takeParagraphs and
+	OLEScrollBox._splitLines are wrapped so that the time spent inside them is counted against the
+	page being built.
+
+	Unless warm is set, the shared font, layout and render caches are emptied before every build,
+	so each build costs what the first visit to a page costs.  Otherwise every build after the
+	first only measures cache hits.
+
+	Args:
+		app:	The App to crawl with.  on_init() must already have been called.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+
+	def __init__(self, app):
+		self._app = app
+		self.repeat = 0
+		self.warm = False
+		self.timings = collections.OrderedDict()  # Lists of milliseconds for every metric, keyed by (story name, page name).
+		self.failures = collections.OrderedDict()  # Why a page could not be built, keyed by (story name, page name).
+		self._sample = None  # Milliseconds per metric for the build being timed right now.
+		self._probes = []  # (owner, method name, original method) for every wrapped method.
+
+	def discover(self):
+		"""Return (story name, "start") for every story file under the Stories folder."""
+		pages = []
+		for (dirpath, dirnames, filenames) in os.walk(Globals.STORY_PATH):
+			for filename in sorted(filenames):
+				if filename.endswith('.xml'):
+					pages.append((os.path.relpath(os.path.join(dirpath, filename), Globals.STORY_PATH), 'start'))
+		return pages
+
+	def links(self, storyName, page):
+		"""Return (story name, page name) for every page which the given PageData leads to."""
+		transitions = [transition for message, location, transition in page.buttons]
+		if page.input is not None:
+			transitions.append(page.input[1])
+
+		links = []
+		for transition in transitions:
+			if transition is None or transition in ('quitgame', 'savegame', 'loadgame'):
+				continue
+			if transition.find('.xml') != -1:
+				links.append((transition, 'start'))
+			else:
+				links.append((storyName, transition))
+		return links
+
+	def crawl(self, repeat, warm=False):
+		"""Visit and time every reachable page, breadth first.  Caches are only kept from build to build if warm is True."""
+		self.repeat = repeat
+		self.warm = warm
+		queue = collections.deque(self.discover())
+		seen = set(queue)
+
+		self._probe(DataStructures.StoryPage, 'takeParagraphs')
+		self._probe(UIElements.OLEScrollBox, '_splitLines')
+		try:
+			while queue:
+				key = queue.popleft()
+				page = self.visit(key, repeat)
+				if page is None:
+					continue
+				for link in self.links(key[0], page):
+					if link not in seen:
+						seen.add(link)
+						queue.append(link)
+		finally:
+			self._unprobe()
+
+	def visit(self, key, repeat):
+		"""Time one page repeat times over.  Return its PageData, or None if it could not be built."""
+		storyName, pageName = key
+		try:
+			self._app._story = self._app._stories.load(storyName)
+		except IOError as err:
+			self.failures[key] = 'Cannot find or open the story: {0}'.format(err)
+			return None
+		page = self._app._story.page(pageName)
+		if page is None:
+			self.failures[key] = 'No such page'
+			return None
+
+		timing = dict((metric, []) for metric in METRICS)
+		try:
+			for count in range(repeat):
+				if not self.warm:
+					self.emptyCaches()
+				self._sample = {}
+				self._app._page = None
+
+				start = time.perf_counter()
+				self._app.turnPage(pageName, self._app.display_width, self._app.display_height)
+				self._sample['turnPage'] = (time.perf_counter() - start) * 1000
+				if self._app._page is None:
+					self.failures[key] = 'Pages of type "{0}" cannot be shown'.format(page.type)
+					return None
+
+				start = time.perf_counter()
+				self._app.on_render()
+				self._sample['render'] = (time.perf_counter() - start) * 1000
+
+				# Prepare the paragraphs a long page would add on later frames, so that they are counted too.
+				while getattr(self._app._page, '_paragraph_stream', None) is not None:
+					self._app._page.animate()
+
+				for metric, value in self._sample.items():
+					timing[metric].append(value)
+				# Throw away anything the page posted, such as scroll events.
+				pygame.event.clear()
+		except Exception as err:
+			self.failures[key] = '{0}: {1}'.format(type(err).__name__, err)
+			return None
+		finally:
+			self._sample = None
+
+		self.timings[key] = timing
+		return page
+
+	def emptyCaches(self):
+		"""Empty the shared font, layout and render caches."""
+		UIElements.FONT_REGISTRY.clear()
+		UIElements.LAYOUT_CACHE.clear()
+		UIElements.RENDER_CACHE.clear()
+
+	def _probe(self, owner, methodName):
+		"""Wrap a method so that the time spent in it is added to the current sample."""
+		original = getattr(owner, methodName)
+		crawler = self
+		def timed(*args, **kwargs):
+			start = time.perf_counter()
+			try:
+				return original(*args, **kwargs)
+			finally:
+				if crawler._sample is not None:
+					crawler._sample[methodName] = crawler._sample.get(methodName, 0) + (time.perf_counter() - start) * 1000
+		setattr(owner, methodName, timed)
+		self._probes.append((owner, methodName, original))
+
+	def _unprobe(self):
+		"""Put every wrapped method back the way it was."""
+		for owner, methodName, original in reversed(self._probes):
+			setattr(owner, methodName, original)
+		self._probes = []
@@ -1,9 +1,19 @@
 import pygame
 from pygame.locals import *
 import os
+import re
+import copy
+import time
 import lxml.etree as ET
 import Globals
 import UIElements
+import SaveWriter
+
+# The tokens of paragraph markup: a run of emphasis tags, a color tag, the spaces between words, or any other text.
+# Emphasis tags only count at the start or end of a word (punctuation aside), so snake_case and 2*3=6 stay as they are.
+MARKUP_TOKENS = re.compile(r'(?P<emphasis>(?<![\w*])[*_]+|[*_]+(?![\w*]))|(?P<tag>\{/\}|\{[a-z]{2}\})|(?P<space> +)|(?P<word>[^ *_{]+|[*_]+|\{)')
+# The single tags in a run of emphasis tags: ** toggles bold, * italic and _ underline.
+EMPHASIS_TAGS = re.compile(r'\*\*|\*|_')
 
 #TEXTIN = pygame.USEREVENT + 3
 
@@ -12,8 +22,8 @@ class Page:
 	The class for displaying an in-game screen.
 
 	Args:
-		page:				An XML tree containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
-		story:				The full XML tree.  Passed in to this class so that Points can be found and filled with variables.
+		page:				The compiled PageData containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
+		story:				The Story which the page belongs to.  Passed in to this class so that Points can be found and filled with variables.
 		exposedVariables:	A global dictionary of all exposed variables which can be referenced across the whole game.
 		gameWidth:			An integer denoting the width of the game window.
 		gameHeight:			An integer denoting the height of the game window.
@@ -30,7 +40,7 @@ class Page:
 	"""
 	
 	def __init__(self, page, story, gameWidth, gameHeight):
-		self.name = page.attrib
+		self.name = page.name
 		self.game_width = gameWidth
 		self.game_height = gameHeight
 		if Globals.FONT_PATH_REGULAR == None: print('WARNING BAD FONT PATH')
@@ -39,6 +49,9 @@ class Page:
 		self.progress_bars = []
 		self.text_input_box = []
 		self.images = []
+		self.exposed_reads = {}  # A copy of every exposed variable the page was built from.  See isStale().
+		self.exposed_keys = None  # The names of all exposed variables, if the page was built from all of them.
+		self.exposed_version = Globals.EXPOSED_VARIABLES.version  # The version of the exposed variables the page was built from.
 	
 	def handleEvent(self, eventObj):
 		if eventObj.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP, pygame.MOUSEBUTTONDOWN, Globals.SCROLLEVENT):
@@ -48,6 +61,66 @@ class Page:
 		for box in self.text_input_box:
 			box.handleEvent(eventObj)
 	
+	def widgets(self):
+		"""Return every widget on the page, in the order they are drawn."""
+		return self.action_buttons + self.text_input_box + self.progress_bars + self.images
+	
+	def blitList(self):
+		"""Return the (surface, rect) pairs which draw every widget on the page, in order."""
+		blits = []
+		for widget in self.widgets():
+			blits.extend(widget.blitList())
+		return blits
+	
+	def draw(self, gameDisplay):
+		"""Draw every widget on the page, with a single Surface.blits() call."""
+		gameDisplay.blits(self.blitList(), False)
+	
+	def animate(self):
+		"""Carry on with any work the page itself has left, such as showing the rest of a long page.  Called once per frame, before the page is drawn.  Moving widgets are driven by UIElements.ANIMATOR instead."""
+		pass
+	
+	def isBusy(self):
+		"""Return True if the page has work left, or any widget on it is scrolling or taking input, and so needs every frame drawn.  Moving widgets are reported by UIElements.ANIMATOR instead."""
+		for box in self.text_input_box:
+			if box.active:
+				return True
+		return False
+	
+	def surfaceBytes(self):
+		"""Estimate the memory held by the page, by adding up the size of every surface its widgets own."""
+		total = 0
+		for widget in self.widgets():
+			for value in vars(widget).values():
+				# Pre-rendered tiles are kept in a dict of surfaces.
+				surfaces = value.values() if isinstance(value, dict) else [value]
+				for surface in surfaces:
+					if isinstance(surface, pygame.Surface):
+						total += surface.get_width() * surface.get_height() * surface.get_bytesize()
+		return total
+	
+	def readVariable(self, name):
+		"""Return the value of an exposed variable, remembering it for isStale()."""
+		value = Globals.EXPOSED_VARIABLES[name]
+		self.rememberVariable(name, value)
+		return value
+	
+	def rememberVariable(self, name, value):
+		"""Note that the page was built from this value of an exposed variable."""
+		self.exposed_reads[name] = copy.copy(value)
+	
+	def isStale(self):
+		"""Return True if any exposed variable the page was built from has changed since."""
+		if Globals.EXPOSED_VARIABLES.version == self.exposed_version:
+			# Nothing at all has changed.
+			return False
+		if self.exposed_keys is not None and self.exposed_keys != set(Globals.EXPOSED_VARIABLES):
+			return True
+		for name, value in self.exposed_reads.items():
+			if name not in Globals.EXPOSED_VARIABLES or Globals.EXPOSED_VARIABLES[name] != value:
+				return True
+		return False
+	
 	def printPage():
 		"""Print out a transcript of the text in the scroll box on the page."""
 		print(self.paragraphs)
@@ -59,8 +132,8 @@ class DuelPage(Page):
 	The class for displaying the card game mechanics.
 
 	Args:
-		page:				An XML tree containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
-		story:				The full XML tree.  Passed in to this class so that Points can be found and filled with variables.
+		page:				The compiled PageData containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
+		story:				The Story which the page belongs to.  Passed in to this class so that Points can be found and filled with variables.
 		exposedVariables:	A global dictionary of all exposed variables which can be referenced across the whole game.
 		gameWidth:			An integer denoting the width of the game window.
 		gameHeight:			An integer denoting the height of the game window.
@@ -93,11 +166,9 @@ class DuelPage(Page):
 
 		self.cards = [UIElements.OLECard(self._HAND['1'], Globals.PLAYER_CHARACTER._deck['testcard'])]  #TEST CODE
 	
-	def draw(self, gameDisplay):
-		"""Invoke the draw command for each element present on the page."""
-		# Draw the buttons
-		for card in self.cards:
-			card.draw(gameDisplay)
+	def widgets(self):
+		"""Return every widget on the page, in the order they are drawn."""
+		return list(self.cards)
 	
 	def handleEvent(self, eventObj):
 		if eventObj.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP, pygame.MOUSEBUTTONDOWN, Globals.SCROLLEVENT):
@@ -111,8 +182,8 @@ class MenuPage(Page):
 	The class for displaying an out-of-game menu.
 
 	Args:
-		page:				An XML tree containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
-		story:				The full XML tree.  Passed in to this class so that Points can be found and filled with variables.
+		page:				The compiled PageData containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
+		story:				The Story which the page belongs to.  Passed in to this class so that Points can be found and filled with variables.
 		exposedVariables:	A global dictionary of all exposed variables which can be referenced across the whole game.
 		gameWidth:			An integer denoting the width of the game window.
 		gameHeight:			An integer denoting the height of the game window.
@@ -167,32 +238,32 @@ class MenuPage(Page):
 		}
 		
 		# Read all buttons into action_buttons.
-		for b in page.findall('button'):
-			if b.find('transition').text == 'quitgame':
-				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[b.find('location').text],
-																						b.find('message').text,
-																						font=pygame.font.Font(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
+		for message, location, transition in page.buttons:
+			if transition == 'quitgame':
+				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[location],
+																						message,
+																						font=UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
 																						event=pygame.event.Event(QUIT)
 																						))
-			elif b.find('transition').text == 'savegame':
-				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[b.find('location').text],
-																						b.find('message').text,
-																						font=pygame.font.Font(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
+			elif transition == 'savegame':
+				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[location],
+																						message,
+																						font=UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
 																						event=pygame.event.Event(Globals.SAVE)
 																						))
+			elif transition == 'loadgame':
+				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[location],
+																						message,
+																						font=UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
+																						event=pygame.event.Event(Globals.LOAD)
+																						))
 			else:
-				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[b.find('location').text],
-																						b.find('message').text,
-																						font=pygame.font.Font(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
-																						event=pygame.event.Event(Globals.NEWPAGE, {'name':b.find('transition').text})
+				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[location],
+																						message,
+																						font=UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
+																						event=pygame.event.Event(Globals.NEWPAGE, {'name':transition})
 																						))
 	
-	def draw(self, gameDisplay):
-		"""Invoke the draw command for each element present on the page."""
-		# Draw the buttons
-		for button in self.action_buttons:
-			button.draw(gameDisplay)
-	
 	def handleEvent(self, eventObj):
 		if eventObj.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP, pygame.MOUSEBUTTONDOWN, Globals.SCROLLEVENT):
 			for button in self.action_buttons:
@@ -205,8 +276,8 @@ class StoryPage(Page):
 	The class for displaying an in-game text or dialog screen.
 
 	Args:
-		page:				An XML tree containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
-		story:				The full XML tree.  Passed in to this class so that Points can be found and filled with variables.
+		page:				The compiled PageData containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
+		story:				The Story which the page belongs to.  Passed in to this class so that Points can be found and filled with variables.
 		exposedVariables:	A global dictionary of all exposed variables which can be referenced across the whole game.
 		gameWidth:			An integer denoting the width of the game window.
 		gameHeight:			An integer denoting the height of the game window.
@@ -275,38 +346,41 @@ class StoryPage(Page):
 		self.scroll_box = UIElements.OLEScrollBox(self.scroll_box_rect, self.paragraphs, Globals.FONT_PATH_REGULAR, fontSize=Globals.FONT_SIZE)
 		
 		# Read all buttons into action_buttons.
-		for b in page.findall('button'):
-			if b.find('transition').text == 'quitgame':
-				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[b.find('location').text],
-																						b.find('message').text,
-																						font=pygame.font.Font(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
+		for message, location, transition in page.buttons:
+			if transition == 'quitgame':
+				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[location],
+																						message,
+																						font=UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
 																						event=pygame.event.Event(QUIT)
 																						))
 			else:
-				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[b.find('location').text],
-																						b.find('message').text,
-																						font=pygame.font.Font(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
-																						event=pygame.event.Event(Globals.NEWPAGE, {'name':b.find('transition').text})
+				self.action_buttons.append(UIElements.OLEButton(self._BUTTON_DIRECTORY[location],
+																						message,
+																						font=UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
+																						event=pygame.event.Event(Globals.NEWPAGE, {'name':transition})
 																						))
 		
 		# Look for a possible input box, and create it if found.
-		input = page.find('input')
-		if input is not None:
-			variable = input.find('variable')
-			if variable is not None:
-				self.text_input_box.append(UIElements.OLEInputBox(self.input_box_rect,
-																							variable.text,
-																							font=pygame.font.Font(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
-																							event=pygame.event.Event(Globals.NEWPAGE, {'name':input.find('transition').text})
-																							))
-				checkInput = True
+		if page.input is not None:
+			variable, transition = page.input
+			self.text_input_box.append(UIElements.OLEInputBox(self.input_box_rect,
+																						variable,
+																						font=UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE),
+																						event=pygame.event.Event(Globals.NEWPAGE, {'name':transition})
+																						))
+			checkInput = True
 		
 		# Load a progress bar for each stat.
 		# There are 8 possible bars.
 		maxBars = 8
 		bars = 0
+		# Every exposed variable is checked for a bar, so a new variable changes the page too.
+		self.exposed_keys = set(Globals.EXPOSED_VARIABLES)
 		for k, v in Globals.EXPOSED_VARIABLES.items():
+			self.rememberVariable(k, v)
 			if v[1] == True:
+				# Keep the bar up to date for as long as the page exists.
+				Globals.EXPOSED_VARIABLES.subscribe(k, self.variableChanged)
 				self.progress_bars.append(UIElements.OLEProgressBar(
 					rect=pygame.Rect(
 						self.game_width * (1 / 200),
@@ -322,27 +396,31 @@ class StoryPage(Page):
 				bars += 2
 
 		# Look for an image source, and import it if found.
-		image = page.find('image')
-		if image is not None:
-			if image.text is not None:
-				self.images.append(UIElements.OLEImage(rect = self.image_rect, image = os.path.join(Globals.IMAGE_PATH, image.text)))
+		if page.image is not None:
+			self.images.append(UIElements.OLEImage(rect = self.image_rect, image = os.path.join(Globals.IMAGE_PATH, page.image)))
 
-	def draw(self, gameDisplay):
-		"""Invoke the draw command for each element present on the page."""
-		# Draw the scroll box
-		self.scroll_box.draw(gameDisplay)
-		# Draw the buttons
-		for button in self.action_buttons:
-			button.draw(gameDisplay)
-		# Draw the input box
-		for box in self.text_input_box:
-			box.draw(gameDisplay)
-		# Draw the progress bars
+	def widgets(self):
+		"""Return every widget on the page, in the order they are drawn."""
+		return [self.scroll_box] + self.action_buttons + self.text_input_box + self.progress_bars + self.images
+	
+	def animate(self):
+		"""Add more of a long page's paragraphs to the scroll box, until they are all shown."""
+		paragraphs = self.takeParagraphs(Globals.PARAGRAPH_TIME_BUDGET)
+		if paragraphs:
+			self.paragraphs.extend(paragraphs)
+			self.scroll_box.addParagraphs(paragraphs)
+	
+	def isBusy(self):
+		"""Return True if the page is still showing its paragraphs, or any widget on it is scrolling or taking input, and so needs every frame drawn."""
+		return self._paragraph_stream is not None or self.scroll_box.dragging or Page.isBusy(self)
+	
+	def variableChanged(self, name, value):
+		"""Redraw the progress bar of an exposed variable which has just changed."""
 		for bar in self.progress_bars:
-			bar.draw(gameDisplay, "n")
-		# Draw the image
-		for image in self.images:
-			image.draw(gameDisplay)
+			if bar.message == name and value is not None and value[1] == True:
+				bar.value = int(value[0])
+				# The bar now shows the new value, so it no longer makes the page stale.
+				self.rememberVariable(name, value)
 	
 	def handleEvent(self, eventObj):
 		if eventObj.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP, pygame.MOUSEBUTTONDOWN, Globals.SCROLLEVENT):
@@ -353,22 +431,35 @@ class StoryPage(Page):
 			box.handleEvent(eventObj)
 
 	def prepareParagraphs(self, page, story):
-		"""Read all paragraph text into lists of DataWord objects, ordered from first to last.  Append these lists to the master list self.paragraphs"""
-		pages = 0
-		more = True
-		found = False
-		while more == True:
-			found = False
-			for p in page.findall('paragraph'):
-				if int(p.attrib['number']) == pages:
-					temp_paragraph_text = p.text.split()
-					injected_paragraph_text = self.processPoints(page, story, temp_paragraph_text)
-					final_paragraph_text = self.formatTextandPoints(page, injected_paragraph_text)
-					self.paragraphs.append(final_paragraph_text)
-					pages += 1
-					found = True
-			if found == False:
-				more = False
+		"""Read paragraph text into lists of DataSpan objects, ordered from first to last, and append these lists to the master list self.paragraphs.  Long pages stop once Globals.PARAGRAPH_TIME_BUDGET runs out, and animate() adds the rest while the page is already on screen."""
+		self._paragraph_stream = self.paragraphStream(page, story)
+		self.paragraphs.extend(self.takeParagraphs(Globals.PARAGRAPH_TIME_BUDGET))
+	
+	def paragraphStream(self, page, story):
+		"""Yield every paragraph of the page in order, as a finished list of DataSpan objects.  Paragraphs are numbered from 0, and the first gap in the numbers ends the page."""
+		expected = 0
+		# sorted() is stable, so of several paragraphs with the same number, the first in the file is used.
+		for number, text in sorted(page.paragraphs, key=lambda paragraph: paragraph[0]):
+			if number < expected:
+				continue
+			if number > expected:
+				break
+			expected += 1
+			injected_paragraph_text = self.processPoints(page, story, text.split())
+			yield self.formatTextandPoints(page, injected_paragraph_text)
+	
+	def takeParagraphs(self, timeBudget):
+		"""Return the next finished paragraphs, stopping once timeBudget milliseconds have been spent.  At least one paragraph is returned, if any are left."""
+		paragraphs = []
+		if self._paragraph_stream is None:
+			return paragraphs
+		start = time.perf_counter()
+		for paragraph in self._paragraph_stream:
+			paragraphs.append(paragraph)
+			if (time.perf_counter() - start) * 1000 >= timeBudget:
+				return paragraphs
+		self._paragraph_stream = None
+		return paragraphs
 	
 	def processPoints(self, page, story, text):
 		"""Take in an unformatted list of strings, and replace all Points with the appropriate sequence of strings.  Return an unformatted list of strings."""
@@ -379,43 +470,21 @@ class StoryPage(Page):
 				# If the word is a point, change it.
 				if (word[-1] == ']'):
 					# No punctuation.
-					for point in story.findall('point'):
-						if point.attrib['name'] == word[1:-1]:
-							variable = point.find('variable')
-							if point.find('option') == None:
-								# Replace point with raw variable data.
-								wordlist.append(Globals.EXPOSED_VARIABLES[variable.text])
-							else:
-								for option in point.findall('option'):
-									# Replace point with correct option's data.
-									if option.attrib['name'] == Globals.EXPOSED_VARIABLES[variable.text]:
-										wordlist.append(option.text)
-				elif (word[-2] == ']'):
+					replacement = story.resolvePoint(word[1:-1], self.readVariable)
+					if replacement is not None:
+						wordlist.append(replacement)
+				elif (word[-2:-1] == ']'):
 					# Yes punctuation.
-					for point in story.findall('point'):
-						if point.attrib['name'] == word[1:-2]:
-							variable = point.find('variable')
-							if point.find('option') == None:
-								# Replace point with raw variable data.
-								wordlist.append(Globals.EXPOSED_VARIABLES[variable.text] + word[-1])
-							else:
-								for option in point.findall('option'):
-									# Replace point with correct option's data.
-									if option.attrib['name'] == Globals.EXPOSED_VARIABLES[variable.text]:
-										wordlist.append(option.text + word[-1])
+					replacement = story.resolvePoint(word[1:-2], self.readVariable)
+					if replacement is not None:
+						wordlist.append(replacement + word[-1])
 			else:
 				# If the word is not a point, skip it.
 				wordlist.append(word)
 		return wordlist
 	
 	def formatTextandPoints(self, page, text):
-		"""Take in an unformatted list of strings.  Return a list of completed DataWord objects.  Find all of the customization tags within the text, remove them, and note their desired effects within each string's respective DataWord."""
-		# TODO: Find a further cleaner way to detect and remove formatting tags.
-		wordlist = text
-		ret_list = []
-		word_format = None
-		word_underline = None
-		word_color = Globals.TEXT_COLOR
+		"""Take in an unformatted list of strings.  Return a list of DataSpan objects, each one a run of words in a single style.  Find all of the customization tags within the text, remove them, and apply their effects to the runs which follow them."""
 		color_dict = {
 			'rd': Globals.RED,
 			'or': Globals.ORANGE,
@@ -429,100 +498,70 @@ class StoryPage(Page):
 			'br': Globals.BROWN
 		}
 		
-		for word in wordlist:
-			front_stripped = False
-			rear_stripped = False
-			temp_word = word
-			temp_word_format = None
-			temp_word_underline = None
-			
-			# Strip any leading tags
-			while front_stripped == False:
-				if len(temp_word) > 0:
-					if (temp_word[0] == '*') and (word_format == None):
-						word_format = 'italic'
-						temp_word_format = word_format
-						temp_word = temp_word[1:]
-					elif (temp_word[0] == '*') and (word_format == 'italic'):
-						word_format = 'bold'
-						temp_word_format = word_format
-						temp_word = temp_word[1:]
-					elif temp_word[0] == '_':
-						word_underline = True
-						temp_word_underline = word_underline
-						temp_word = temp_word[1:]
-					elif (temp_word[0] == '{') and len(temp_word) >= 4:
-						if temp_word[3] == '}':
-							word_color = color_dict[ temp_word[1:3] ]
-							temp_word = temp_word[4:]
-						else:
-							front_stripped = True
-					else:
-						front_stripped = True
-				else:
-					front_stripped = True
-			
-			remove_format = False
-			remove_color = False
-			# Strip any trailing tags
-			while rear_stripped == False:
-				if len(temp_word) > 0:
-					# Bold case
-					if (len(temp_word) >= 3) and (word_format == 'bold'):
-						if (temp_word[-2:] == '**'):
-							remove_format = True
-							temp_word = temp_word[:-2]
-						elif (temp_word[-3:-1] == '**'):
-							remove_format = True
-							temp_word = temp_word[:-3] + temp_word[-1]
-						else:
-							rear_stripped = True
-					# Italic case
-					elif (len(temp_word) >= 2) and (word_format == 'italic'):
-						if (temp_word[-1:] == '*'):
-							remove_format = True
-							temp_word = temp_word[:-1]
-						elif (temp_word[-2:-1] == '*'):
-							remove_format = True
-							temp_word = temp_word[:-2] + temp_word[-1]
-						else:
-							rear_stripped = True
-					# Underline case
-					elif (len(temp_word) >= 2) and word_underline:
-						if temp_word[-1:] == '_':
-							remove_format = True
-							temp_word = temp_word[:-1]
-						elif (temp_word[-2:-1] == '_'):
-							remove_format = True
-							temp_word = temp_word[:-2] + temp_word[-1]
-						else:
-							rear_stripped = True
-					# Color case
-					elif (temp_word[-1:] == '}') and (len(temp_word) >= 4):
-						if (temp_word[-3:] == '{/}'):
-							remove_color = True
-							temp_word = temp_word[:-3]
-						else:
-							rear_stripped = True
+		ret_list = []
+		run = [] # The words of the run being read.
+		run_space = False # Is there a space between the run being read and the one before it?
+		space = False # Has a space been read since the last word?
+		word_bold = False
+		word_italic = False
+		word_underline = False
+		word_color = Globals.TEXT_COLOR
+		run_style = (word_bold, word_italic, word_underline, word_color)
+		
+		# The text is read in one pass, one token at a time.  Tags change the style of everything after them.
+		for match in MARKUP_TOKENS.finditer(' '.join(text)):
+			emphasis, tag, word = match.group('emphasis'), match.group('tag'), match.group('word')
+			if match.group('space') is not None:
+				space = True
+				continue
+			if emphasis is not None:
+				# Bold, italic and underline are separate, so closing one leaves the others as they are.
+				for tag in EMPHASIS_TAGS.findall(emphasis):
+					if tag == '**':
+						word_bold = not word_bold
+					elif tag == '*':
+						word_italic = not word_italic
 					else:
-						rear_stripped = True
+						word_underline = not word_underline
+				continue
+			if tag is not None:
+				if tag == '{/}':
+					word_color = Globals.TEXT_COLOR
+				elif tag[1:3] in color_dict:
+					word_color = color_dict[tag[1:3]]
 				else:
-					rear_stripped = True
+					# Not a color this engine knows, so it is just text.
+					word = tag
+				if word is None:
+					continue
 			
-			# Apply formatting tags via creating a DataWord, unless no word remains
-			if len(temp_word) > 0:
-				if word_format == 'italic':
-					data = DataWord(temp_word, pygame.font.Font(Globals.FONT_PATH_ITALIC, Globals.FONT_SIZE), temp_word_underline, word_color)
-				elif word_format == 'bold':
-					data = DataWord(temp_word, pygame.font.Font(Globals.FONT_PATH_BOLD, Globals.FONT_SIZE), temp_word_underline, word_color)
-				else:
-					data = DataWord(temp_word, pygame.font.Font(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE), temp_word_underline, word_color)
-				ret_list.append(data)
-			if remove_format == True:
-				word_format = None
-			if remove_color == True:
-				word_color = Globals.TEXT_COLOR
+			style = (word_bold, word_italic, word_underline, word_color)
+			if style != run_style and run:
+				# The style changed, so the run so far is finished.
+				ret_list.append(self.makeSpan(run, run_style, run_space))
+				run = []
+			if not run:
+				run_style = style
+				run_space = space
+			elif space:
+				run.append(' ')
+			run.append(word)
+			space = False
+		
+		if run:
+			ret_list.append(self.makeSpan(run, run_style, run_space))
 		return ret_list
+	
+	def makeSpan(self, run, style, spaceBefore):
+		"""Return a DataSpan holding the text of the run, in the given (bold, italic, underline, color) style.  Text which is both bold and italic is drawn in the bold font, slanted."""
+		word_bold, word_italic, word_underline, word_color = style
+		if word_bold:
+			font = UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_BOLD, Globals.FONT_SIZE, italic=word_italic, underline=word_underline)
+		elif word_italic:
+			font = UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_ITALIC, Globals.FONT_SIZE, underline=word_underline)
+		else:
+			font = UIElements.FONT_REGISTRY.get(Globals.FONT_PATH_REGULAR, Globals.FONT_SIZE, underline=word_underline)
+		return DataSpan(''.join(run), font, word_underline, word_color, spaceBefore)
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
 
@@ -531,8 +570,8 @@ class ActionPage(Page):
 	The class for displaying an out-of-game menu.
 
 	Args:
-		page:				An XML tree containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
-		story:				The full XML tree.  Passed in to this class so that Points can be found and filled with variables.
+		page:				The compiled PageData containing the information which is to be represented on the screen.  TODO: Consider replacing this arg with a search of the story variable.
+		story:				The Story which the page belongs to.  Passed in to this class so that Points can be found and filled with variables.
 		exposedVariables:	A global dictionary of all exposed variables which can be referenced across the whole game.
 		gameWidth:			An integer denoting the width of the game window.
 		gameHeight:			An integer denoting the height of the game window.
@@ -554,20 +593,308 @@ class ActionPage(Page):
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
 
-class DataWord:
-	def __init__(self, word, font, underline, color):
-		self.word = word
+class PagePrefetcher:
+	"""
+	The class for building the pages a player might turn to next, before they click.
+
+	Whenever a page is shown, plan() queues every page its buttons lead to within the same Story.
+	work() is called with the spare time left over in each frame, and builds queued pages until
+	that time (capped at Globals.PREFETCH_TIME_BUDGET) or Globals.PREFETCH_MEMORY_BUDGET runs out.
+	A page cannot be built in pieces, so it is only started if a running estimate of how long a
+	build takes fits in the time left.  Pages often take longer to build than the budget allows,
+	so once the estimate has kept every build out for Globals.PREFETCH_REPROBE_FRAMES frames, the
+	next page is built anyway and the estimate is measured again.  A page which fails to build is
+	dropped with a warning.
+	take() hands a finished page over when the player clicks, unless an exposed variable the page
+	was built from has changed in the meantime, in which case the page is thrown away.
+
+	Args:
+		buildPage:	A function which takes a page name and returns a newly built Page, or None.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+
+	def __init__(self, buildPage):
+		self._buildPage = buildPage
+		self._story = None  # The Story which the queued and prefetched pages belong to.
+		self._pending = []  # Names of pages still to be built, in the order they will be built.
+		self._ready = {}  # Prefetched pages, keyed by page name.
+		self._bytes = 0  # Estimated memory held by the prefetched pages.
+		self._buildTime = None  # Running estimate of the milliseconds one page takes to build, or None before the first build.
+		self._waited = 0  # Frames in a row in which the estimate kept a queued page from being built.
+
+	def plan(self, story, page):
+		"""Queue every page reachable from the given PageData.  Prefetched pages which are no longer reachable are dropped."""
+		if story is not self._story:
+			self.clear()
+			self._story = story
+
+		targets = []
+		for message, location, transition in page.buttons:
+			# Only pages in this story can be built ahead of time.
+			if transition is None or transition in ('quitgame', 'savegame', 'loadgame') or transition.find('.xml') != -1:
+				continue
+			if transition not in targets and story.page(transition) is not None:
+				targets.append(transition)
+
+		for pageName in list(self._ready):
+			if pageName not in targets:
+				self.discard(pageName)
+		self._pending = [pageName for pageName in targets if pageName not in self._ready]
+
+	def work(self, timeBudget):
+		"""Build queued pages for up to timeBudget milliseconds.  A page is only started if the estimated build time still fits in what is left, or if pages have waited Globals.PREFETCH_REPROBE_FRAMES frames for it to fit."""
+		timeLeft = min(timeBudget, Globals.PREFETCH_TIME_BUDGET)
+		built = False  # Has a page been started in this frame?
+		while self._pending:
+			if self._bytes >= Globals.PREFETCH_MEMORY_BUDGET:
+				self._pending = []
+				return
+			if self.buildTime() > timeLeft:
+				if built:
+					return
+				self._waited += 1
+				if self._waited <= Globals.PREFETCH_REPROBE_FRAMES:
+					return
+			self._waited = 0
+			built = True
+			pageName = self._pending.pop(0)
+			start = time.perf_counter()
+			try:
+				page = self._buildPage(pageName)
+			except Exception as err:
+				# The page is built again if the player clicks through to it, and the error is met there.
+				print("WARNING: Cannot prefetch page {0}!  Error: {1}".format(pageName, err))
+				continue
+			finally:
+				buildTime = (time.perf_counter() - start) * 1000
+				timeLeft -= buildTime
+			self.measureBuild(buildTime)
+			if page is None:
+				continue
+			pageBytes = page.surfaceBytes()
+			if self._bytes + pageBytes > Globals.PREFETCH_MEMORY_BUDGET:
+				# Too big to keep, and everything else in the queue will have to wait for a new plan.
+				self._pending = []
+				return
+			self._ready[pageName] = (page, pageBytes)
+			self._bytes += pageBytes
+
+	def buildTime(self):
+		"""Return the estimated milliseconds one page takes to build.  Until a page has been built, a build is assumed to take the whole of Globals.PREFETCH_TIME_BUDGET."""
+		if self._buildTime is None:
+			return Globals.PREFETCH_TIME_BUDGET
+		return self._buildTime
+	
+	def measureBuild(self, milliseconds):
+		"""Fold the time one build took into the running estimate, with the newest builds counting the most."""
+		if self._buildTime is None:
+			self._buildTime = milliseconds
+		else:
+			self._buildTime = (self._buildTime + milliseconds) / 2
+	
+	def busy(self):
+		"""Return True if queued pages are waiting for spare frame time."""
+		return len(self._pending) > 0
+	
+	def take(self, story, pageName):
+		"""Return the prefetched page with the given name and forget it, or None if it was not prefetched or has gone stale."""
+		if story is not self._story or pageName not in self._ready:
+			return None
+		page, pageBytes = self._ready[pageName]
+		self.discard(pageName)
+		if page.isStale():
+			return None
+		return page
+
+	def discard(self, pageName):
+		"""Forget one prefetched page."""
+		page, pageBytes = self._ready.pop(pageName)
+		self._bytes -= pageBytes
+
+	def clear(self):
+		"""Forget every queued and prefetched page."""
+		self._pending = []
+		self._ready = {}
+		self._bytes = 0
+
+	def _propGetReady(self):
+		return list(self._ready)
+
+	def _propGetPending(self):
+		return list(self._pending)
+
+	ready = property(_propGetReady)
+	pending = property(_propGetPending)
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class Story:
+	"""
+	The class for holding one loaded Story file.
+
+	The pages of the story are compiled into PageData and indexed by name once, when the story
+	is loaded, so that turning the page is a single dictionary lookup instead of a search of the
+	whole tree.  The story's Points are compiled in the same way, so that filling in a Point is
+	a single lookup as well.  A Story holds no XML, so it can be stored in the compiled story
+	cache (see StoryLoader.py) and loaded again without parsing the file.
+
+	Args:
+		tree:		The parsed XML tree of the Story file.
+		name:		The filename of the Story, used when reporting problems with its contents.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+
+	def __init__(self, tree, name=''):
+		self.name = name
+		self.pages = {}  # Every page in the story as PageData, keyed by its "name" attribute.
+		self.points = {}  # Every point in the story, keyed by its "name" attribute.  See compilePoints().
+		root = tree.getroot()
+		self.indexPages(root)
+		self.compilePoints(root)
+
+	def indexPages(self, root):
+		"""Compile every page and build the name-to-page index.  Duplicate page names are reported, and the last page with that name is used."""
+		self.pages = {}
+		for page in root.findall('page'):
+			self.checkDuplicatePage(page.attrib['name'], self.pages)
+			self.pages[page.attrib['name']] = PageData(page)
+
+	def checkDuplicatePage(self, pageName, index):
+		"""Report a page name which is already present in the given index."""
+		if pageName in index:
+			print("WARNING: Story {0} has more than one page named {1}!  Only the last one will be used.".format(self.name, pageName))
+
+	def compilePoints(self, root):
+		"""Build the point table.  Each point name maps to a tuple of the exposed variable it reads, and a dict of its options (or None, if the raw variable is used)."""
+		self.points = {}
+		for point in root.findall('point'):
+			self.compilePoint(point)
+
+	def compilePoint(self, point):
+		"""Add one <point> element to the point table."""
+		options = None
+		if point.find('option') is not None:
+			options = {}
+			for option in point.findall('option'):
+				options[option.attrib['name']] = option.text
+		self.points[point.attrib['name']] = (point.find('variable').text, options)
+
+	def resolvePoint(self, pointName, readVariable=None):
+		"""Return the text which should replace the named point, or None if the point or a matching option does not exist.  Exposed variables are read through readVariable, if it is given."""
+		point = self.points.get(pointName)
+		if point is None:
+			return None
+		variable, options = point
+		if readVariable is None:
+			value = Globals.EXPOSED_VARIABLES[variable]
+		else:
+			value = readVariable(variable)
+		if options is None:
+			# Replace point with raw variable data.
+			return value
+		# Replace point with correct option's data.
+		return options.get(value)
+
+	def page(self, pageName):
+		"""Return the page with the given name, or None if the story has no such page."""
+		return self.pages.get(pageName)
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class PageData:
+	"""
+	The class for one compiled Story page.
+
+	Only plain Python data is read out of the <page> element, so that pages can be pickled into
+	the compiled story cache, and the Page classes never need to search the XML themselves.
+
+	Args:
+		page:		The <page> XML element to compile.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+
+	def __init__(self, page):
+		self.name = page.attrib['name']
+		self.type = page.attrib['type']
+		self.paragraphs = []  # (number, text) tuples, in the order they appear in the file.
+		self.buttons = []  # (message, location, transition) tuples.
+		self.input = None  # (variable, transition) tuple, if the page asks for text input.
+		self.image = None  # Filename of the page image, relative to the Images folder.
+
+		for p in page.findall('paragraph'):
+			self.paragraphs.append((int(p.attrib['number']), p.text or ''))
+
+		for b in page.findall('button'):
+			self.buttons.append((b.find('message').text, b.find('location').text, b.find('transition').text))
+
+		input = page.find('input')
+		if input is not None:
+			variable = input.find('variable')
+			if variable is not None:
+				self.input = (variable.text, input.find('transition').text)
+
+		image = page.find('image')
+		if image is not None:
+			self.image = image.text
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class DataSpan:
+	"""
+	The class for one run of paragraph text, all in a single style.
+
+	Consecutive words in the same style share one span, so the scroll box measures and renders
+	them together.  Words inside a span are separated by single spaces.  A span which follows
+	another without a space between them (such as the punctuation after an italic word) is glued
+	to it, and lines are never broken between the two.
+
+	A long page holds thousands of spans, so they have no __dict__; only the attributes below can
+	be set.
+
+	Args:
+		text:			The words of the run.
+		font:			The shared font the run is drawn in.
+		underline:		Is the run underlined?  (Already applied to the font.)
+		color:			The color of the run.
+		spaceBefore:	Is there a space between this span and the one before it?
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+	__slots__ = ('text', 'font', 'underline', 'color', 'spaceBefore')
+	
+	def __init__(self, text, font, underline, color, spaceBefore=True):
+		self.text = text
 		self.font = font
 		self.underline = underline
 		self.color = color
 		if self.color == None:
 			self.color = Globals.TEXT_COLOR
-		
-		def __str__(self):
-			return self.word
-		
-		def __repr__(self):
-			return self.word
+		self.spaceBefore = spaceBefore
+	
+	def __str__(self):
+		return self.text
+	
+	def __repr__(self):
+		return 'DataSpan({0!r})'.format(self.text)
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
 
@@ -592,16 +919,15 @@ class Character:
 		
 	def readSave(self, savePath):
 		"""Read character stats from file into the stats dictionary"""
-		root = ET.parse(savePath, Globals.PARSER).getroot()
-		
-		character = root.find('character')
-		self.name = character.attrib['name']
-		for stat in character.findall('stat'):
-			self.stats[stat.attrib['name']] = stat.text.replace('\n','').replace('\t','')
-		
-		savedDeck = root.find('deck')
-		for card in savedDeck.findall('card'):
-			self._deck[card.attrib['name']] = Card(os.path.join(Globals.CARDS_PATH, card.attrib['name'] + '.xml'))
+		self.restore(SaveWriter.readSave(savePath))
+	
+	def restore(self, snapshot):
+		"""Replace the character's name, stats and deck with those of a snapshot, such as one from a save slot"""
+		self.name = snapshot['name']
+		self.stats = dict(snapshot['stats'])
+		self._deck = {}
+		for cardName in snapshot.get('deck', []):
+			self._deck[cardName] = CARD_LIBRARY.get(cardName)
 	
 	def loadStats(self, globalStats):
 		"""Create the list of stats by cross-referencing the save file and global stats"""
@@ -633,27 +959,14 @@ class Character:
 		for s, v in self.stats.items():
 			exposedStats[s] = v
 	
+	def snapshot(self):
+		"""Return a copy of everything a save file holds about the character, which later changes to the character cannot touch"""
+		# Stat values are strings, so a shallow copy of the dict is enough.
+		return {'name': self.name, 'stats': dict(self.stats), 'deck': list(self._deck)}
+	
 	def _writeSave(self, saveFilePath):
-		"""Write or overwrite the character stats into the save directory"""
-		saveTree = ET.parse(saveFilePath, Globals.PARSER)
-		root = saveTree.getroot()
-		character = root.find('character')
-		character.attrib['name'] = self.name
-		print(self.stats)
-		
-		for stat, value in self.stats.items():
-			print(stat, ":", value)
-			statExists = False
-			for oldStat in character.findall('stat'):
-				if oldStat.attrib['name'] == stat:
-					statExists = True
-					oldStat.text = value
-			if statExists == False:
-				newStat = character.makeelement('stat', {'name': stat})
-				newStat.text = value
-				character.append(newStat)
-
-		saveTree.write(saveFilePath, pretty_print=True)
+		"""Write or overwrite the character stats into the save directory, on this thread.  SaveWriter does the same in the background."""
+		SaveWriter.writeSave(saveFilePath, self.snapshot())
 	
 		"""
 		self.hp
@@ -718,30 +1031,130 @@ class BodyPart:
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
 
 class Card:
+	"""
+	The class for one action card, read from a file in the Cards folder.
+
+	Cards are shared by every deck which holds them (see CardLibrary), so a Card never changes
+	once it has been read.  Its attributes are read only.
+
+	Args:
+		cardPath:	The path of the card file.
+
+	Returns:
+		nothing
+
+	Raises:
+		Exception:	The file has no <card> in it.
+	"""
+	__slots__ = ('_name', '_background', '_flavor_text', '_image', '_red', '_green', '_yellow', '_blue', '_side_effects')
+	
 	def __init__(self, cardPath = None):
-		self._name = None
-		self._background = None
-		self._flavor_text = None
-		self._image = None
-		self._red = None
-		self._green = None
-		self._yellow = None
-		self._blue = None
-		self._side_effects = None
-		
 		root = ET.parse(cardPath, Globals.PARSER).getroot()
 		card_data = root.find('card')
 		if card_data == None:
 			raise Exception("No card data found for: " + cardPath)
 
 		# TODO: Load background and image files into the Card object from file.
+		# Only the text is kept, so the parsed file can be thrown away.
 		self._name = card_data.attrib['name']
-		self._background = card_data.find('background')
-		self._flavor_text = card_data.find('flavortext').text
-		self._image = card_data.find('image')
-		self._red = card_data.find('red').text
-		self._green = card_data.find('green').text
-		self._yellow = card_data.find('yellow').text
-		self._blue = card_data.find('blue').text
-		self._side_effects = card_data.find('sideeffects').text
-		
+		self._background = card_data.findtext('background')
+		self._flavor_text = card_data.findtext('flavortext')
+		self._image = card_data.findtext('image')
+		self._red = card_data.findtext('red')
+		self._green = card_data.findtext('green')
+		self._yellow = card_data.findtext('yellow')
+		self._blue = card_data.findtext('blue')
+		self._side_effects = card_data.findtext('sideeffects')
+	
+	def _propGetName(self):
+		return self._name
+	
+	def _propGetBackground(self):
+		return self._background
+	
+	def _propGetFlavorText(self):
+		return self._flavor_text
+	
+	def _propGetImage(self):
+		return self._image
+	
+	def _propGetRed(self):
+		return self._red
+	
+	def _propGetGreen(self):
+		return self._green
+	
+	def _propGetYellow(self):
+		return self._yellow
+	
+	def _propGetBlue(self):
+		return self._blue
+	
+	def _propGetSideEffects(self):
+		return self._side_effects
+	
+	name = property(_propGetName)
+	background = property(_propGetBackground)
+	flavorText = property(_propGetFlavorText)
+	image = property(_propGetImage)
+	red = property(_propGetRed)
+	green = property(_propGetGreen)
+	yellow = property(_propGetYellow)
+	blue = property(_propGetBlue)
+	sideEffects = property(_propGetSideEffects)
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class CardLibrary:
+	"""
+	The class for sharing one Card object per card file across every deck in the game.
+
+	The Cards folder is indexed the first time a card is asked for, and each card file is only
+	read the first time that card is asked for.  After that, every deck which holds the card
+	(the player's, or any opponent's) is handed the same Card.
+
+	Args:
+		nothing
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+	def __init__(self):
+		self._paths = None  # The path of every card file, keyed by card name (the file name without ".xml").
+		self._cards = {}  # Every card read so far, keyed by card name.
+	
+	def index(self):
+		"""Find every card file under the Cards folder."""
+		self._paths = {}
+		for (dirpath, dirnames, filenames) in os.walk(Globals.CARDS_PATH):
+			for filename in sorted(filenames):
+				if filename.endswith('.xml'):
+					self._paths.setdefault(filename[:-len('.xml')], os.path.join(dirpath, filename))
+	
+	def get(self, cardName):
+		"""Return the shared Card for cardName, reading its file the first time it is asked for."""
+		card = self._cards.get(cardName)
+		if card is None:
+			if self._paths is None:
+				self.index()
+			# A card added since the folder was indexed is still found at its usual path.
+			card = Card(self._paths.get(cardName, os.path.join(Globals.CARDS_PATH, cardName + '.xml')))
+			self._cards[cardName] = card
+		return card
+	
+	def names(self):
+		"""Return the name of every card in the Cards folder."""
+		if self._paths is None:
+			self.index()
+		return sorted(self._paths)
+	
+	def clear(self):
+		"""Forget every card read so far, and index the Cards folder again the next time a card is asked for."""
+		self._paths = None
+		self._cards = {}
+
+# The library which every deck shares.
+CARD_LIBRARY = CardLibrary()
@@ -0,0 +1,19 @@
+import os
+import threading
+
+
+def replaceFile(path, data, sync=True):
+	"""Replace the file at path with data, atomically, so a crash never leaves half a file behind.  The data is written to a temp file which is renamed over the old file.  If sync is True the temp file is flushed to disk first, which only files worth keeping (such as saves) need; a cache file can simply be rebuilt."""
+	# The same file may be written from several threads at once, so each writer gets its own temp file.
+	tempPath = '{0}.{1}.tmp'.format(path, threading.get_ident())
+	try:
+		with open(tempPath, 'wb') as tempFile:
+			tempFile.write(data)
+			if sync:
+				tempFile.flush()
+				os.fsync(tempFile.fileno())
+		os.replace(tempPath, path)
+	except BaseException:
+		if os.path.exists(tempPath):
+			os.remove(tempPath)
+		raise
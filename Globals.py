@@ -2,6 +2,7 @@ import pygame
 import sys
 import os
 import lxml.etree
+from VariableStore import VariableStore
 
 
 def init():
@@ -12,6 +13,10 @@ def init():
 	NEWPAGE = pygame.USEREVENT + 2
 	global SAVE
 	SAVE = pygame.USEREVENT + 3
+	global SAVED
+	SAVED = pygame.USEREVENT + 4  # Posted by SaveWriter once a save has been written, with its path, slot and any error.
+	global LOAD
+	LOAD = pygame.USEREVENT + 5
 
 	# XML Parser
 	global PARSER
@@ -20,6 +25,44 @@ def init():
 	# Game Settings
 	global FPS
 	FPS = 60
+	global DIRTY_RECTS
+	DIRTY_RECTS = True  # Only redraw and update the parts of the display which changed since the last frame.
+	global IDLE_WAIT
+	IDLE_WAIT = True  # Sleep until the next event, instead of drawing every frame, while nothing on screen is moving.
+	global IDLE_TIMEOUT
+	IDLE_TIMEOUT = 500  # Most milliseconds to sleep at a time while idle.
+	global HEADLESS
+	HEADLESS = False  # Render into an off-screen surface with no window, using SDL's dummy drivers.  Set by --headless.
+	global STORY_CACHE
+	STORY_CACHE = True  # Keep compiled stories in CACHE_PATH, so unchanged story files are never parsed twice.
+	global STREAMING_THRESHOLD
+	STREAMING_THRESHOLD = 16 * 1024 * 1024  # Story files of at least this many bytes are streamed a page at a time.
+	global STREAMING_PAGE_CACHE
+	STREAMING_PAGE_CACHE = 32  # How many pages of a streamed story are kept in memory at once.
+	global STORY_PRELOAD
+	STORY_PRELOAD = True  # Load every story in STORY_PATH in the background at startup.
+	global STORY_PRELOAD_WORKERS
+	STORY_PRELOAD_WORKERS = 2
+	global PREFETCH
+	PREFETCH = True  # Build the pages reachable from the current page during spare frame time.
+	global PREFETCH_TIME_BUDGET
+	PREFETCH_TIME_BUDGET = 8  # Most milliseconds of any one frame which may be spent prefetching.
+	global PREFETCH_REPROBE_FRAMES
+	PREFETCH_REPROBE_FRAMES = 30  # Frames a queued page waits for its estimated build time to fit, before it is built anyway.
+	global PREFETCH_MEMORY_BUDGET
+	PREFETCH_MEMORY_BUDGET = 64 * 1024 * 1024  # Most bytes of surfaces which prefetched pages may hold.
+	global PARAGRAPH_TIME_BUDGET
+	PARAGRAPH_TIME_BUDGET = 8  # Most milliseconds of any one frame which may be spent preparing the paragraphs of a long page.
+	global AUTOSAVE
+	AUTOSAVE = True  # Save the game in the background when the player turns the page.
+	global AUTOSAVE_INTERVAL
+	AUTOSAVE_INTERVAL = 60 * 1000  # Fewest milliseconds between two autosaves.  0 autosaves at every page.
+	global AUTOSAVE_SLOT
+	AUTOSAVE_SLOT = 'Autosave'  # The save slot which autosaves are written to.
+	global SAVE_SLOT
+	SAVE_SLOT = 'Save'  # The save slot which the save button writes to, unless its event names another.
+	global SAVE_DATABASE
+	SAVE_DATABASE = 'saves.db'  # The file in SAVES_PATH which holds every save slot.
 
 	# Global Colors
 	global BLACK
@@ -62,6 +105,8 @@ def init():
 	BROWN = (210, 105, 30)
 
 	# Global Paths
+	global CACHE_PATH
+	CACHE_PATH = 'Cache'
 	global CARDS_PATH
 	CARDS_PATH = 'Cards'
 	global FONT_PATH
@@ -98,5 +143,5 @@ def init():
 
 	# All variables exposed to the Story.  Cannot contain the exact key "name"
 	global EXPOSED_VARIABLES
-	EXPOSED_VARIABLES = {}
+	EXPOSED_VARIABLES = VariableStore()
 	global PLAYER_CHARACTER
@@ -0,0 +1,123 @@
+import json
+import time
+import sqlite3
+import threading
+import collections
+from SaveWriter import readSave, writeSave
+
+# Bump this whenever the tables change shape.
+SCHEMA_VERSION = 1
+
+# What a load screen needs to know about one slot, without reading the save itself.
+SlotInfo = collections.namedtuple('SlotInfo', ['name', 'character', 'story', 'page', 'savedAt', 'playtime'])
+
+
+class SaveStore:
+	"""
+	The class for keeping any number of save slots in one SQLite database.
+
+	Each slot is one row.  Its snapshot (the same shape writeSave() takes) is stored as JSON,
+	next to a copy of the details a load screen shows: the character's name, where the player
+	is, when the slot was saved and how long they have played.  Those details are also held in
+	an index, so slots() lists hundreds of slots without reading a single snapshot.  Writing a
+	slot is one SQLite transaction, so a crash never leaves half a save behind.
+
+	Slots can be imported from and exported to the XML save format, for modders.
+
+	The store may be used from the game loop and from SaveWriter's worker thread at once; every
+	call holds a lock around the one shared connection.
+
+	Args:
+		path:	The database file.  It is created if it does not exist.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		self._lock = threading.Lock()
+		self._connection = sqlite3.connect(path, check_same_thread=False)
+		self.createTables()
+
+	def createTables(self):
+		"""Create the slots table and its index, if they do not exist yet."""
+		with self._lock:
+			# Readers never wait for a slot being written, and a write syncs once instead of twice.
+			self._connection.execute('PRAGMA journal_mode=WAL')
+			with self._connection:
+				self._connection.execute(
+					'CREATE TABLE IF NOT EXISTS slots ('
+					'name TEXT PRIMARY KEY, character TEXT, story TEXT, page TEXT, '
+					'saved_at REAL NOT NULL, playtime REAL NOT NULL, snapshot TEXT NOT NULL)'
+				)
+				# Covers every column slots() reads, in the order it lists them.
+				self._connection.execute(
+					'CREATE INDEX IF NOT EXISTS slots_by_time ON slots '
+					'(saved_at DESC, name, character, story, page, playtime)'
+				)
+				self._connection.execute('PRAGMA user_version = {0:d}'.format(SCHEMA_VERSION))
+
+	def save(self, slotName, snapshot):
+		"""Write a snapshot into the named slot, replacing whatever the slot held."""
+		story, page = snapshot.get('location', (None, None))
+		row = (
+			slotName,
+			snapshot['name'],
+			story,
+			page,
+			snapshot.get('savedAt', time.time()),
+			snapshot.get('playtime', 0),
+			json.dumps(snapshot, default=str)
+		)
+		with self._lock, self._connection:
+			self._connection.execute(
+				'INSERT OR REPLACE INTO slots (name, character, story, page, saved_at, playtime, snapshot) '
+				'VALUES (?, ?, ?, ?, ?, ?, ?)', row
+			)
+
+	def load(self, slotName):
+		"""Return the snapshot in the named slot, or None if there is no such slot."""
+		with self._lock:
+			row = self._connection.execute('SELECT snapshot FROM slots WHERE name = ?', (slotName,)).fetchone()
+		if row is None:
+			return None
+		snapshot = json.loads(row[0])
+		if 'location' in snapshot:
+			snapshot['location'] = tuple(snapshot['location'])
+		return snapshot
+
+	def slots(self):
+		"""Return a SlotInfo for every slot, most recently saved first."""
+		with self._lock:
+			rows = self._connection.execute(
+				'SELECT name, character, story, page, saved_at, playtime FROM slots ORDER BY saved_at DESC'
+			).fetchall()
+		return [SlotInfo(*row) for row in rows]
+
+	def delete(self, slotName):
+		"""Remove the named slot, if it exists."""
+		with self._lock, self._connection:
+			self._connection.execute('DELETE FROM slots WHERE name = ?', (slotName,))
+
+	def importXML(self, slotName, saveFilePath):
+		"""Read an XML save file into the named slot."""
+		snapshot = readSave(saveFilePath)
+		snapshot['savedAt'] = time.time()
+		self.save(slotName, snapshot)
+
+	def exportXML(self, slotName, saveFilePath):
+		"""Write the named slot out as an XML save file.  Return False if there is no such slot."""
+		snapshot = self.load(slotName)
+		if snapshot is None:
+			return False
+		writeSave(saveFilePath, snapshot)
+		return True
+
+	def close(self):
+		"""Close the database.  The store cannot be used afterwards."""
+		with self._lock:
+			self._connection.close()
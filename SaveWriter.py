@@ -0,0 +1,177 @@
+import threading
+import concurrent.futures
+import pygame
+import lxml.etree as ET
+import Globals
+from FileUtils import replaceFile
+
+
+def readSave(saveFilePath):
+	"""Read the save file at saveFilePath into a snapshot, the same shape writeSave() takes."""
+	root = ET.parse(saveFilePath, Globals.PARSER).getroot()
+	character = root.find('character')
+	snapshot = {'name': character.attrib['name'], 'stats': {}, 'deck': []}
+	for stat in character.findall('stat'):
+		snapshot['stats'][stat.attrib['name']] = (stat.text or '').replace('\n','').replace('\t','')
+
+	deck = root.find('deck')
+	if deck is not None:
+		snapshot['deck'] = [card.attrib['name'] for card in deck.findall('card')]
+
+	variables = root.find('variables')
+	if variables is not None:
+		snapshot['variables'] = {}
+		for variable in variables.findall('variable'):
+			value = variable.text or ''
+			if 'display' in variable.keys():
+				value = [value, variable.attrib['display'] == 'yes']
+			snapshot['variables'][variable.attrib['name']] = value
+
+	location = root.find('location')
+	if location is not None:
+		snapshot['location'] = (location.attrib['story'], location.attrib['page'])
+
+	playtime = root.find('playtime')
+	if playtime is not None:
+		snapshot['playtime'] = float(playtime.text)
+	return snapshot
+
+
+def writeSave(saveFilePath, snapshot):
+	"""Write a snapshot into the save file at saveFilePath.  The snapshot holds the character's name and stats, and may also hold its deck, the exposed variables, the story location and the seconds played.  Everything else in the file is kept as it is.  The file is replaced atomically, so a crash never leaves half a save file behind."""
+	try:
+		saveTree = ET.parse(saveFilePath, Globals.PARSER)
+		root = saveTree.getroot()
+	except IOError:
+		# There is no save file yet, so start an empty one.
+		root = ET.Element('data')
+		saveTree = ET.ElementTree(root)
+	character = root.find('character')
+	if character is None:
+		character = ET.SubElement(root, 'character')
+	character.attrib['name'] = snapshot['name']
+
+	# Index the stats already in the file, so that each stat is found in one step.
+	oldStats = {}
+	for oldStat in character.findall('stat'):
+		oldStats.setdefault(oldStat.attrib['name'], []).append(oldStat)
+	for stat, value in snapshot['stats'].items():
+		if stat in oldStats:
+			for oldStat in oldStats[stat]:
+				oldStat.text = value
+		else:
+			newStat = character.makeelement('stat', {'name': stat})
+			newStat.text = value
+			character.append(newStat)
+
+	if 'deck' in snapshot:
+		deck = root.find('deck')
+		if deck is None:
+			deck = ET.SubElement(root, 'deck')
+		# The deck is only rewritten if it changed, so the cards keep whatever else they hold.
+		if [card.attrib['name'] for card in deck.findall('card')] != snapshot['deck']:
+			for card in deck.findall('card'):
+				deck.remove(card)
+			for cardName in snapshot['deck']:
+				ET.SubElement(deck, 'card', {'name': cardName})
+
+	if 'variables' in snapshot:
+		variables = root.find('variables')
+		if variables is not None:
+			root.remove(variables)
+		variables = ET.SubElement(root, 'variables')
+		for name, value in snapshot['variables'].items():
+			variable = ET.SubElement(variables, 'variable', {'name': name})
+			if isinstance(value, (list, tuple)) and len(value) == 2:
+				# A stat, held as [value, display], written the way the Stats files write it.
+				value, display = value
+				variable.attrib['display'] = 'yes' if display == True else 'no'
+			variable.text = str(value)
+
+	if 'location' in snapshot:
+		location = root.find('location')
+		if location is None:
+			location = ET.SubElement(root, 'location')
+		location.attrib['story'], location.attrib['page'] = snapshot['location']
+
+	if 'playtime' in snapshot:
+		playtime = root.find('playtime')
+		if playtime is None:
+			playtime = ET.SubElement(root, 'playtime')
+		playtime.text = '{0:.0f}'.format(snapshot['playtime'])
+
+	replaceFile(saveFilePath, ET.tostring(saveTree, pretty_print=True))
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class SaveWriter:
+	"""
+	The class for writing save files in the background, without holding up the game loop.
+
+	save() takes a snapshot of the character on the calling thread, so the game can carry on
+	changing it straight away, and hands the snapshot to a single worker thread.  The worker
+	writes it with writeSave(), or into a SaveStore slot for saveSlot(), and then posts a
+	Globals.SAVED event with the path of the file, the slot (or None) and the error which stopped
+	it (or None).  Saves are written one at a time, in order.  If the same file or slot is saved
+	again before the worker has started on it, only the newest snapshot is written.
+
+	Args:
+		nothing
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+
+	def __init__(self):
+		self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+		self._lock = threading.Lock()
+		self._pending = {}  # The newest (write function, snapshot) which has not been written yet, keyed by (path, slot).
+
+	def save(self, saveFilePath, character):
+		"""Snapshot the character, and write it to saveFilePath in the background."""
+		self.saveSnapshot(saveFilePath, character.snapshot())
+
+	def saveSnapshot(self, saveFilePath, snapshot):
+		"""Write a snapshot which has already been taken to saveFilePath in the background.  See writeSave() for what it may hold."""
+		self._queue((saveFilePath, None), lambda snapshot: writeSave(saveFilePath, snapshot), snapshot)
+
+	def saveSlot(self, store, slotName, snapshot):
+		"""Write a snapshot which has already been taken into the named slot of a SaveStore in the background."""
+		self._queue((store.path, slotName), lambda snapshot: store.save(slotName, snapshot), snapshot)
+
+	def _queue(self, key, write, snapshot):
+		"""Hand a snapshot to the worker, to be written by calling write(snapshot)."""
+		with self._lock:
+			queued = key in self._pending
+			self._pending[key] = (write, snapshot)
+		# A save of this file which is still queued will pick up the new snapshot.
+		if not queued:
+			self._executor.submit(self._write, key)
+
+	def pending(self):
+		"""Return True if any save has not been written yet."""
+		with self._lock:
+			return len(self._pending) > 0
+
+	def _write(self, key):
+		"""Write the newest snapshot for a (path, slot), and tell the game loop how it went."""
+		with self._lock:
+			write, snapshot = self._pending.pop(key)
+		error = None
+		try:
+			write(snapshot)
+		except Exception as err:
+			error = '{0}: {1}'.format(type(err).__name__, err)
+		try:
+			pygame.event.post(pygame.event.Event(Globals.SAVED, path=key[0], slot=key[1], error=error))
+		except pygame.error:
+			# The game is already shutting down, so there is nobody left to tell.
+			pass
+
+	def shutdown(self):
+		"""Finish writing every queued save, then stop the worker thread."""
+		self._executor.shutdown(wait=True)
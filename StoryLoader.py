@@ -0,0 +1,292 @@
+import os
+import re
+import pickle
+import collections
+import concurrent.futures
+import lxml.etree as ET
+import Globals
+from DataStructures import Story, PageData
+from FileUtils import replaceFile
+
+# Bump this whenever Story or PageData change shape, so that old cache files are rebuilt.
+CACHE_VERSION = 3
+
+# How many bytes of a streamed story are scanned at a time.
+SCAN_CHUNK_SIZE = 1024 * 1024
+# The start of a page tag (but not of any other tag beginning with "page"), or of markup which may hide one.
+PAGE_MARKUP = re.compile(rb'<(/?page(?=[\s>/])|!--|!\[CDATA\[|\?|!DOCTYPE)')
+# The same, or the start of any other element, used until the root element has been found.
+ANY_MARKUP = re.compile(rb'<(/?page(?=[\s>/])|!--|!\[CDATA\[|\?|!DOCTYPE|(?=[^!?/]))')
+# The rest of each kind of markup, matched from the end of its start.
+MARKUP_ENDS = {
+	b'page': re.compile(rb'(?:[^>"\']|"[^"]*"|\'[^\']*\')*>'),
+	b'/page': re.compile(rb'[^>]*>'),
+	b'!--': re.compile(rb'.*?-->', re.S),
+	b'![CDATA[': re.compile(rb'.*?\]\]>', re.S),
+	b'?': re.compile(rb'.*?\?>', re.S),
+	b'!DOCTYPE': re.compile(rb'(?:[^\[>]|\[.*?\])*>', re.S)
+}
+
+
+def loadStory(storyName):
+	"""Load a file from the Stories folder as a Story.  The compiled story cache is used instead of the XML whenever the file has not changed since it was cached."""
+	storyPath = os.path.join(Globals.STORY_PATH, storyName)
+	storyStat = os.stat(storyPath)
+	# A cached story is only valid for the exact file it was compiled from.
+	key = (CACHE_VERSION, os.path.abspath(storyPath), storyStat.st_mtime_ns, storyStat.st_size)
+
+	if Globals.STORY_CACHE:
+		story = readCachedStory(storyName, key)
+		if story is not None:
+			return story
+
+	story = None
+	if storyStat.st_size >= Globals.STREAMING_THRESHOLD:
+		# Very large stories are never held in memory whole.  Only their page index is built.
+		try:
+			story = StreamingStory(storyPath, storyName)
+		except ValueError as err:
+			print("WARNING: Cannot stream {0}, so it is read whole instead!  Error: {1}".format(storyName, err))
+	if story is None:
+		story = Story(ET.parse(storyPath, Globals.PARSER), storyName)
+
+	if Globals.STORY_CACHE:
+		writeCachedStory(storyName, key, story)
+	return story
+
+
+def cachePath(storyName):
+	"""Return the path of the compiled cache file for the named story."""
+	return os.path.join(Globals.CACHE_PATH, storyName + '.cache')
+
+
+def readCachedStory(storyName, key):
+	"""Return the cached Story for storyName if its key matches, otherwise None."""
+	try:
+		with open(cachePath(storyName), 'rb') as cacheFile:
+			# The key is stored first, so a stale cache is rejected without unpickling the story.
+			if pickle.load(cacheFile) != key:
+				return None
+			return pickle.load(cacheFile)
+	except Exception:
+		# A missing, stale or corrupt cache file is simply rebuilt from the XML.
+		return None
+
+
+def writeCachedStory(storyName, key, story):
+	"""Write the compiled Story to the cache.  The file is replaced atomically, so a crash never leaves half a cache file behind."""
+	path = cachePath(storyName)
+	# The key is stored first, so a stale cache is rejected without unpickling the story.
+	data = pickle.dumps(key, pickle.HIGHEST_PROTOCOL) + pickle.dumps(story, pickle.HIGHEST_PROTOCOL)
+	try:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		# The cache is rebuilt from the XML if it is ever lost, so it is not worth syncing to disk.
+		replaceFile(path, data, sync=False)
+	except OSError as err:
+		print("Cannot write the story cache for {0}!  Error: {1}".format(storyName, err))
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class StreamingStory(Story):
+	"""
+	The class for holding one very large Story file, without holding all of its pages in memory.
+
+	The file is streamed once with iterparse to compile the story's Points, and scanned once to
+	record where every <page> starts and ends.  Pages are only read and compiled when page() asks
+	for them, parsed together with the file's prolog (its XML declaration and DOCTYPE), and
+	only the most recently used STREAMING_PAGE_CACHE pages are kept, so memory use stays bounded
+	no matter how large the file is.  The page index is small and can be pickled into the
+	compiled story cache like any other Story.
+
+	Args:
+		storyPath:	The path of the Story file.
+		name:		The filename of the Story, used when reporting problems with its contents.
+
+	Returns:
+		nothing
+
+	Raises:
+		ValueError:	The pages found by scanning the file do not match the pages found by parsing it.
+					loadStory() then reads the file whole instead.
+	"""
+
+	def __init__(self, storyPath, name=''):
+		self.name = name
+		self.path = storyPath
+		self.pages = collections.OrderedDict()  # The most recently used pages as PageData, least recent first.
+		self.points = {}
+		self.offsets = {}  # (start, end) byte offsets of every page element, keyed by name.
+		self.prolog = b''  # Everything in the file before the root element.
+		self.indexFile()
+
+	def __getstate__(self):
+		# Materialized pages are not worth caching; they are read again on demand.
+		state = self.__dict__.copy()
+		state['pages'] = collections.OrderedDict()
+		return state
+
+	def indexFile(self):
+		"""Stream the file to find where every page starts, and compile all Points along the way."""
+		pageNames = []  # The name of every page, in the order they appear in the file.
+		for event, element in ET.iterparse(self.path, events=('start', 'end'), tag=('page', 'point'), remove_blank_text=True):
+			if event == 'start':
+				if element.tag == 'page':
+					pageNames.append(element.attrib['name'])
+			else:
+				if element.tag == 'point':
+					self.compilePoint(element)
+				# Throw away everything parsed so far, so that the tree never grows.
+				element.clear()
+				while element.getprevious() is not None:
+					del element.getparent()[0]
+
+		# The n-th page element in the raw file is the n-th page found by iterparse.
+		# (libxml2 line numbers stop counting at 65535, so element.sourceline cannot be used.)
+		pageSpans, prologEnd = self.findPages()
+		if len(pageSpans) != len(pageNames):
+			raise ValueError("Cannot index the pages of {0}: found {1} page elements for {2} pages".format(self.name, len(pageSpans), len(pageNames)))
+		self.offsets = {}
+		for pageName, span in zip(pageNames, pageSpans):
+			self.checkDuplicatePage(pageName, self.offsets)
+			self.offsets[pageName] = span
+		with open(self.path, 'rb') as storyFile:
+			self.prolog = storyFile.read(prologEnd)
+
+	def findPages(self):
+		"""Scan the file a chunk at a time.  Return the (start, end) byte offsets of every outermost page element, and the byte offset of the root element.  Page tags inside comments, CDATA sections, processing instructions and the DOCTYPE are skipped."""
+		pageSpans = []
+		prologEnd = None  # Byte offset of the root element, once it has been found.
+		pageStart = None  # Byte offset of the outermost page element which is still open.
+		depth = 0  # How many page elements are open.
+		data = b''  # What is left to scan of the file.
+		dataStart = 0  # Byte offset of data in the file.
+		with open(self.path, 'rb') as storyFile:
+			while True:
+				chunk = storyFile.read(SCAN_CHUNK_SIZE)
+				data += chunk
+				position = 0
+				while True:
+					markup = (PAGE_MARKUP if prologEnd is not None else ANY_MARKUP).search(data, position)
+					if markup is None:
+						# The last few bytes may be the start of markup which the next chunk finishes.
+						position = max(position, len(data) - len(b'<![CDATA['))
+						break
+					kind = markup.group(1)
+					if kind == b'':
+						prologEnd = dataStart + markup.start()
+						position = markup.end()
+						continue
+					end = MARKUP_ENDS[kind].match(data, markup.end())
+					if end is None:
+						# Finished by the next chunk, if there is one.
+						position = markup.start()
+						break
+					if kind == b'page' and not end.group().endswith(b'/>'):
+						if depth == 0:
+							pageStart = dataStart + markup.start()
+						depth += 1
+					elif kind == b'page' and depth == 0:
+						pageSpans.append((dataStart + markup.start(), dataStart + end.end()))
+					elif kind == b'/page' and depth > 0:
+						depth -= 1
+						if depth == 0:
+							pageSpans.append((pageStart, dataStart + end.end()))
+					position = end.end()
+				if not chunk:
+					break
+				dataStart += position
+				data = data[position:]
+		return pageSpans, prologEnd or 0
+
+	def page(self, pageName):
+		"""Return the page with the given name, reading it from the file if it is not in memory, or None if the story has no such page."""
+		if pageName in self.pages:
+			self.pages.move_to_end(pageName)
+			return self.pages[pageName]
+		if pageName not in self.offsets:
+			return None
+
+		page = PageData(self.readPage(*self.offsets[pageName]))
+		self.pages[pageName] = page
+		while len(self.pages) > Globals.STREAMING_PAGE_CACHE:
+			self.pages.popitem(last=False)
+		return page
+
+	def readPage(self, start, end):
+		"""Read and parse the single <page> element between the byte offsets start and end.  The file's prolog is parsed in front of it, so the page is decoded in the file's encoding and the entities its DOCTYPE declares are resolved."""
+		with open(self.path, 'rb') as storyFile:
+			storyFile.seek(start)
+			data = storyFile.read(end - start)
+		if len(data) != end - start:
+			raise IOError("{0} has changed since its pages were indexed".format(self.name))
+		return ET.fromstring(self.prolog + data, Globals.PARSER)
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class StoryRegistry:
+	"""
+	The class for loading every Story in the Stories folder in the background.
+
+	discover() finds every story file and hands them all to a pool of worker threads, so they are
+	parsed (or read from the compiled story cache) while the start menu is on screen.  load() then
+	hands over the finished Story when a transition asks for it.  If the story is not ready yet,
+	load() waits for a story which is already being loaded, or loads it directly on the calling
+	thread, just as if there were no registry at all.
+
+	Args:
+		workers:	The number of worker threads.  Defaults to Globals.STORY_PRELOAD_WORKERS.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+
+	def __init__(self, workers=None):
+		if workers is None:
+			workers = Globals.STORY_PRELOAD_WORKERS
+		self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+		self._futures = {}  # The pending or finished load of every discovered story, keyed by story name.
+
+	def discover(self):
+		"""Find every story file under the Stories folder, and start loading each of them in the background."""
+		for (dirpath, dirnames, filenames) in os.walk(Globals.STORY_PATH):
+			for filename in sorted(filenames):
+				if filename.endswith('.xml'):
+					storyName = os.path.relpath(os.path.join(dirpath, filename), Globals.STORY_PATH)
+					if storyName not in self._futures:
+						self._futures[storyName] = self._executor.submit(loadStory, storyName)
+
+	def ready(self, storyName):
+		"""Return the named Story if it has finished loading in the background, otherwise None."""
+		future = self._futures.get(storyName)
+		if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+			return None
+		return future.result()
+
+	def load(self, storyName):
+		"""Return the named Story, loading it on this thread if the background load has not started or has failed."""
+		future = self._futures.get(storyName)
+		if future is not None:
+			if future.running():
+				# It is already half loaded, so waiting is quicker than starting again.
+				concurrent.futures.wait([future])
+			story = self.ready(storyName)
+			if story is not None:
+				return story
+			future.cancel()
+
+		# The blocking path.  Errors such as a missing file are raised to the caller from here.
+		story = loadStory(storyName)
+		future = concurrent.futures.Future()
+		future.set_result(story)
+		self._futures[storyName] = future
+		return story
+
+	def shutdown(self):
+		"""Stop the worker threads, abandoning any stories which have not started loading."""
+		# Executor.shutdown only cancels queued work itself from Python 3.9 on.
+		for future in list(self._futures.values()):
+			future.cancel()
+		self._executor.shutdown(wait=False)
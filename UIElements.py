@@ -1,4 +1,6 @@
 import os
+import weakref
+import collections
 import pygame
 from pygame.locals import *
 import Globals
@@ -12,8 +14,279 @@ SCROLLBARWIDTH = 16
 LINESPACING = 1
 LINEINDENT = 6
 SCROLLSPEED = 16
+RENDERCACHESIZE = 4096
+LAYOUTCACHESIZE = 2048
+WIDTHCACHESIZE = 65536
+TILEHEIGHT = 1024
 
 
+class OLEFontRegistry(object):
+	"""
+	The class for sharing pygame Font objects across the whole game.
+
+	Loading a TTF file is expensive, so every widget and every DataSpan asks the registry for its
+	font instead of constructing one.  Each distinct (path, size, style) is loaded once and then
+	shared.  Because a font is shared, nothing may call set_bold(), set_italic() or
+	set_underline() on it; ask the registry for a font with that style instead.
+
+	Fonts live until clear() is called, which must happen before pygame.font.quit() (or
+	pygame.quit()), and whenever the font settings change.
+
+	Args:
+		nothing
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+	def __init__(self):
+		self._fonts = {} # Every loaded font, keyed by (path, size, bold, italic, underline).
+	
+	def get(self, path, size, bold=False, italic=False, underline=False):
+		"""Return the shared font for this path, size and style, loading it the first time it is asked for."""
+		key = (path, size, bold, italic, underline)
+		font = self._fonts.get(key)
+		if font is None:
+			font = pygame.font.Font(path, size)
+			font.set_bold(bold)
+			font.set_italic(italic)
+			font.set_underline(underline)
+			self._fonts[key] = font
+		return font
+	
+	def clear(self):
+		"""Release every font.  Widgets built before this call keep their fonts alive until they are discarded."""
+		self._fonts = {}
+	
+	def __len__(self):
+		return len(self._fonts)
+
+# The registry which every part of the game shares.
+FONT_REGISTRY = OLEFontRegistry()
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class OLERenderCache(object):
+	"""
+	The class for reusing rendered text surfaces.
+
+	The same words in the same fonts and colors turn up again and again, on every redraw and on
+	every page.  The cache keeps the most recently used rendered surfaces, so a redraw mostly
+	blits surfaces which already exist.  Surfaces handed out by the cache are shared, so they must
+	only ever be blitted, never drawn on.
+
+	Args:
+		maxSize:	The most surfaces which will be kept.  The least recently used are dropped first.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+	def __init__(self, maxSize=RENDERCACHESIZE):
+		self._surfaces = collections.OrderedDict() # Rendered surfaces, least recently used first.
+		self._maxSize = maxSize
+		self.hits = 0 # How many renders were answered from the cache?
+		self.misses = 0 # How many renders had to be drawn?
+	
+	def render(self, text, font, color, background):
+		"""Return the anti-aliased surface for text drawn in this font and these colors."""
+		key = (text, font, tuple(color), tuple(background))
+		surface = self._surfaces.get(key)
+		if surface is None:
+			self.misses += 1
+			surface = font.render(text, True, color, background)
+			self._surfaces[key] = surface
+			if len(self._surfaces) > self._maxSize:
+				self._surfaces.popitem(last=False)
+		else:
+			self.hits += 1
+			self._surfaces.move_to_end(key)
+		return surface
+	
+	def clear(self):
+		"""Drop every cached surface, and reset the counters."""
+		self._surfaces = collections.OrderedDict()
+		self.hits = 0
+		self.misses = 0
+	
+	def __len__(self):
+		return len(self._surfaces)
+
+# The cache which every part of the game shares.
+RENDER_CACHE = OLERenderCache()
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class OLELayoutCache(object):
+	"""
+	The class for reusing text measurements and line breaks.
+
+	Every word is measured once per font, and the width is kept.  Where the lines of a paragraph
+	break depends only on its words, their fonts, the width of a space and the width of the box,
+	so the breaks of the most recently laid out paragraphs are kept too.  Turning back to a page,
+	or any page which repeats a paragraph, then skips measuring and wrapping entirely.  Only the
+	pieces of text on each line are kept, never the spans themselves, so paragraphs which differ
+	only in color still share their layout.
+
+	Args:
+		maxSize:	The most paragraphs whose line breaks will be kept.  The least recently used are dropped first.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+	def __init__(self, maxSize=LAYOUTCACHESIZE):
+		self._widths = {} # The width in pixels of every measured word, keyed by (font, text).
+		self._breaks = collections.OrderedDict() # Words per line of laid out paragraphs, least recently used first.
+		self._maxSize = maxSize
+		self.hits = 0 # How many paragraphs were laid out from the cache?
+		self.misses = 0 # How many paragraphs had to be measured and wrapped?
+	
+	def width(self, font, text):
+		"""Return the width in pixels of text drawn in this font."""
+		key = (font, text)
+		width = self._widths.get(key)
+		if width is None:
+			if len(self._widths) >= WIDTHCACHESIZE:
+				self._widths = {}
+			width = font.size(text)[0]
+			self._widths[key] = width
+		return width
+	
+	def breakLines(self, paragraph, lineWidth, spaceWidth):
+		"""Return the lines which the paragraph's DataSpans fill when wrapped to lineWidth pixels.  Each line is a tuple of (span index, start, end) pieces of span text.  spaceWidth is the space between two spans."""
+		key = (tuple([(span.text, span.font, span.spaceBefore) for span in paragraph]), lineWidth, spaceWidth)
+		breaks = self._breaks.get(key)
+		if breaks is not None:
+			self.hits += 1
+			self._breaks.move_to_end(key)
+			return breaks
+		
+		self.misses += 1
+		breaks = []
+		current_line = []
+		current_line_length = 0
+		for index, span in enumerate(paragraph):
+			span_space_width = self.width(span.font, ' ')
+			start = 0
+			for word in span.text.split(' '):
+				end = start + len(word)
+				word_width = self.width(span.font, word)
+				if start > 0:
+					gap = span_space_width # Between two words of the same span.
+				elif span.spaceBefore:
+					gap = spaceWidth # Between two spans.
+				else:
+					gap = 0 # Glued to the span before, so the line cannot break here.
+				if current_line and gap and current_line_length + gap + word_width >= lineWidth:
+					# If the current line exceeds the margins
+					breaks.append(tuple(current_line))
+					current_line = []
+					current_line_length = 0
+					gap = 0
+				if start > 0 and current_line:
+					# The word continues the piece of the span which is already on this line.
+					current_line[-1] = (index, current_line[-1][1], end)
+				else:
+					current_line.append((index, start, end))
+				current_line_length += gap + word_width
+				start = end + 1
+		breaks.append(tuple(current_line)) # Last remaining words.
+		
+		self._breaks[key] = breaks
+		if len(self._breaks) > self._maxSize:
+			self._breaks.popitem(last=False)
+		return breaks
+	
+	def clear(self):
+		"""Drop every cached width and line break, and reset the counters."""
+		self._widths = {}
+		self._breaks = collections.OrderedDict()
+		self.hits = 0
+		self.misses = 0
+	
+	def __len__(self):
+		return len(self._breaks)
+
+# The cache which every part of the game shares.
+LAYOUT_CACHE = OLELayoutCache()
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class OLECompositor(object):
+	"""
+	The class for redrawing only the parts of the screen which have changed.
+
+	Every widget sets its dirty flag whenever its appearance changes.  Each frame, render() collects
+	the rect of every dirty widget, together with the rect it was last drawn at (so a widget which
+	moved or shrank is also erased), and redraws the page clipped to those regions only.  The
+	regions are returned so that only they are passed on to pygame.display.update().  After
+	reset(), such as when the page is turned, the next frame redraws the whole screen.
+
+	Args:
+		background:	The color behind every widget.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+	def __init__(self, background=Globals.BLACK):
+		self._background = background
+		self._drawnRects = {} # The rect every widget was last drawn at, keyed by the widget's id.
+		self._fullRedraw = True # Must the next frame redraw the whole screen?
+	
+	def reset(self):
+		"""Forget everything drawn so far, so that the next frame redraws the whole screen."""
+		self._drawnRects = {}
+		self._fullRedraw = True
+	
+	def render(self, page, surfaceObj):
+		"""Redraw the changed parts of the page onto the surface.  Return the list of rects which changed, or None if the whole surface did."""
+		widgets = page.widgets()
+		if self._fullRedraw:
+			surfaceObj.fill(self._background)
+			page.draw(surfaceObj)
+			self._remember(widgets)
+			self._fullRedraw = False
+			return None
+		
+		regions = []
+		for widget in widgets:
+			if widget.dirty:
+				drawnRect = self._drawnRects.get(id(widget))
+				if drawnRect is None:
+					regions.append(pygame.Rect(widget.rect))
+				else:
+					regions.append(drawnRect.union(widget.rect))
+		if not regions:
+			return []
+		
+		# The page is drawn once, clipped to the area around every region.  Pixels in the area which
+		# are outside every region are drawn exactly as they already were.
+		area = regions[0].unionall(regions[1:])
+		surfaceObj.set_clip(area)
+		surfaceObj.fill(self._background)
+		page.draw(surfaceObj)
+		surfaceObj.set_clip(None)
+		self._remember(widgets)
+		return regions
+	
+	def _remember(self, widgets):
+		"""Record where every widget was drawn, and mark them all clean."""
+		for widget in widgets:
+			self._drawnRects[id(widget)] = pygame.Rect(widget.rect)
+			widget.dirty = False
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
 class OLEButton(object):
 	"""
 	The class for an in-game button.
@@ -49,7 +322,7 @@ class OLEButton(object):
 		self._fgcolor = fgcolor
 		
 		if font is None:
-			self._font = pygame.font.Font('freesansbold.ttf', 14)
+			self._font = FONT_REGISTRY.get('freesansbold.ttf', 14)
 		else:
 			self._font = font
 		
@@ -59,6 +332,7 @@ class OLEButton(object):
 		self.lastMouseDownOverButton = False # Was the last mouse down event over the mouse button? (Used to track clicks.)
 		self._visible = True # Is the button visible?
 		self.customSurfaces = False # Does the button start as a text button instead of having custom images for each surface?
+		self.dirty = True # Has the button's appearance changed since it was last drawn?
 		
 		self._action = action
 		self._event = event
@@ -98,6 +372,7 @@ class OLEButton(object):
 	
 	def _update(self):
 		"""Redraw the button's Surface object. Call this method when the button has changed appearance."""
+		self.dirty = True
 		if self.customSurfaces:
 			self.surfaceNormal = pygame.transform.smoothscale(self.origSurfaceNormal, self._rect.size)
 			self.surfaceDown = pygame.transform.smoothscale(self.origSurfaceDown, self._rect.size)
@@ -151,15 +426,20 @@ class OLEButton(object):
 		pygame.draw.line(self.surfaceHighlight, Globals.GRAY, (w - 2, 2), (w - 2, h - 2)) # vertical right
 		pygame.draw.line(self.surfaceHighlight, Globals.GRAY, (w - 3, 3), (w - 3, h - 2)) # vertical right
 	
+	def blitList(self):
+		"""Return the (surface, rect) pairs which draw the current button's appearance, in order, for Surface.blits()."""
+		if not self._visible:
+			return []
+		if self.buttonDown:
+			return [(self.surfaceDown, self._rect)]
+		elif self.mouseOverButton:
+			return [(self.surfaceHighlight, self._rect)]
+		else:
+			return [(self.surfaceNormal, self._rect)]
+	
 	def draw(self, surfaceObj):
 		"""Blit the current button's appearance to the surface object."""
-		if self._visible:
-			if self.buttonDown:
-				surfaceObj.blit(self.surfaceDown, self._rect)
-			elif self.mouseOverButton:
-				surfaceObj.blit(self.surfaceHighlight, self._rect)
-			else:
-				surfaceObj.blit(self.surfaceNormal, self._rect)
+		surfaceObj.blits(self.blitList(), False)
 	
 	
 	def handleEvent(self, eventObj):
@@ -168,6 +448,7 @@ class OLEButton(object):
 			return []
 		
 		retVal = []
+		lastState = (self.buttonDown, self.mouseOverButton) # The state which decides which surface is drawn.
 		
 		hasExited = False
 		if not self.mouseOverButton and self._rect.collidepoint(eventObj.pos):
@@ -216,6 +497,9 @@ class OLEButton(object):
 			self.mouseExit(eventObj)
 			retVal.append('exit')
 		
+		if (self.buttonDown, self.mouseOverButton) != lastState:
+			self.dirty = True
+		
 		return retVal
 	
 	def mouseClick(self, event):
@@ -261,6 +545,7 @@ class OLEButton(object):
 	
 	def _propSetVisible(self, setting):
 		self._visible = setting
+		self.dirty = True
 	
 	def _propGetFgColor(self):
 		return self._fgcolor
@@ -329,21 +614,22 @@ class OLEProgressBar(object):
 		
 		# Set font.
 		if (fontPath is None) and (fontSize is None):
-			self._font = pygame.font.Font('freesansbold.ttf', 12)
-			self._fontBig = pygame.font.Font('freesansbold.ttf', 12 + 4)
+			self._font = FONT_REGISTRY.get('freesansbold.ttf', 12)
+			self._fontBig = FONT_REGISTRY.get('freesansbold.ttf', 12 + 4)
 		elif fontPath is None:
-			self._font = pygame.font.Font('freesansbold.ttf', fontSize)
-			self._fontBig = pygame.font.Font('freesansbold.ttf', fontSize + 4)
+			self._font = FONT_REGISTRY.get('freesansbold.ttf', fontSize)
+			self._fontBig = FONT_REGISTRY.get('freesansbold.ttf', fontSize + 4)
 		elif fontSize is None:
-			self._font = pygame.font.Font(fontPath, 12)
-			self._fontBig = pygame.font.Font(fontPath, 12 + 4)
+			self._font = FONT_REGISTRY.get(fontPath, 12)
+			self._fontBig = FONT_REGISTRY.get(fontPath, 12 + 4)
 		else:
-			self._font = pygame.font.Font(fontPath, fontSize)
-			self._fontBig = pygame.font.Font(fontPath, fontSize + 4)
+			self._font = FONT_REGISTRY.get(fontPath, fontSize)
+			self._fontBig = FONT_REGISTRY.get(fontPath, fontSize + 4)
 		
 		# Tracks the state of the bar.
 		self._visible = True # Is the bar visible?
 		self.customSurfaces = False # Does the bar start as a color bar instead of having custom images for each surface?
+		self.dirty = True # Has the bar's appearance changed since it was last drawn?
 		
 		if normal is None:
 			# Create the surfaces for a color bar.
@@ -380,6 +666,7 @@ class OLEProgressBar(object):
 	
 	def _update(self):
 		"""Redraw the bar's Surface object. Call this method when the bar has changed appearance."""
+		self.dirty = True
 		if self.customSurfaces:
 			self.surfaceNormal = pygame.transform.smoothscale(self.origSurfaceNormal, self._rect.size)
 			self.surfaceDark = pygame.transform.smoothscale(self.origsurfaceDark, self._rect.size)
@@ -437,15 +724,20 @@ class OLEProgressBar(object):
 		pygame.draw.line(self.surfaceHighlight, Globals.RED, (0, h), (barRightEnd, h)) # horizontal bar bottom
 		pygame.draw.line(self.surfaceHighlight, Globals.RED, (barRightEnd, barTopHeight), (barRightEnd, h)) # vertical bar right
 	
+	def blitList(self, state = "n"):
+		"""Return the (surface, rect) pairs which draw the current bar's appearance, in order, for Surface.blits()."""
+		if not self._visible:
+			return []
+		if state == "d": # d for dark
+			return [(self.surfaceDark, self._rect)]
+		elif state == "h": # h for highlight
+			return [(self.surfaceHighlight, self._rect)]
+		else: # n for normal, or any other value
+			return [(self.surfaceNormal, self._rect)]
+	
 	def draw(self, surfaceObj, state = "n"):
 		"""Blit the current bar's appearance to the surface object."""
-		if self._visible:
-			if state == "d": # d for dark
-				surfaceObj.blit(self.surfaceDark, self._rect)
-			elif state == "h": # h for highlight
-				surfaceObj.blit(self.surfaceHighlight, self._rect)
-			else: # n for normal, or any other value
-				surfaceObj.blit(self.surfaceNormal, self._rect)
+		surfaceObj.blits(self.blitList(state), False)
 	
 	def _propGetMessage(self):
 		return self._message
@@ -476,6 +768,7 @@ class OLEProgressBar(object):
 	
 	def _propSetVisible(self, setting):
 		self._visible = setting
+		self.dirty = True
 	
 	def _propGetFgColor(self):
 		return self._fgcolor
@@ -502,6 +795,7 @@ class OLEProgressBar(object):
 		self._update()
 	
 	message = property(_propGetMessage, _propSetMessage)
+	value = property(_propGetValue, _propSetValue)
 	rect = property(_propGetRect, _propSetRect)
 	visible = property(_propGetVisible, _propSetVisible)
 	fgcolor = property(_propGetVisible, _propSetVisible)
@@ -519,9 +813,9 @@ class UIWord(object):
 		self.underline = underline
 		self.color = color
 		if font == None:
-			self._font = pygame.font.Font('font' + '-' + format +'.ttf', size)
+			self._font = FONT_REGISTRY.get('font' + '-' + format +'.ttf', size)
 		else:
-			self._font = pygame.font.Font(None, size)
+			self._font = FONT_REGISTRY.get(None, size)
 			
 	@property
 	def word(self):
@@ -562,23 +856,21 @@ class OLEScrollBox(object):
 		self._scrolling = False # Does the scroll box need to scroll?
 		self._position = 0 # How far up or down is the text scrolled in pixels?
 		self._excessTextHeight = 0 # By how many pixels do the lines of text exceed the box's height?
+		self._tiles = {} # Pre-rendered strips of the text, TILEHEIGHT pixels tall, keyed by their index from the top.
+		self._dirty = True # Has the box's appearance changed since it was last drawn?
 		
 		# Generate a font object to use as a spacing and layout reference
-		self.font_regular = pygame.font.Font(fontPath, fontSize)
-		self.font_big_regular = pygame.font.Font(fontPath, fontSize + 4)
+		self.font_regular = FONT_REGISTRY.get(fontPath, fontSize)
+		self.font_big_regular = FONT_REGISTRY.get(fontPath, fontSize + 4)
 		
 		self.font_height = self.font_regular.size('Tp')[1]  # Determine maximum possible height of one line of text.
 		self.font_space_width = self.font_regular.size(' ')[0]  # Determine width of a space
 		
 		# Split message into lines.
 		self._lines = self._splitLines(self._message)
-		# Determine if the box must be scrollable.
-		if len(self._lines) * (self.font_height + LINESPACING) > self._rect.height:
-			self._scrolling = True
-			self._excessTextHeight = (len(self._lines) * (self.font_height + LINESPACING)) - self._rect.height
-		# If so, create a scroll bar.
-		if self._scrolling:
-			self._scrollBar = OLEScrollBar(self._rect, self)
+		# Determine if the box must be scrollable, and if so, create a scroll bar.
+		self._scrollBar = None
+		self._measureText()
 		
 		if normal is None:
 			# Create the surfaces for a scroll box.
@@ -590,25 +882,46 @@ class OLEScrollBox(object):
 			self.setSurfaces(normal, scroll)
 	
 	def _splitLines(self, message):
-		"""Isolate the DataWords of the paragraph message into lines, so that they can be arranged within the margins of the scroll box."""
+		"""Isolate the DataSpans of the paragraph message into lines, so that they can be arranged within the margins of the scroll box.  Each line is a tuple of spans.  A span which does not fit on one line is cut into one piece per line; every other span is shared with the paragraph rather than copied."""
 		lines = []
 		for paragraph in message:
-			current_line_length = 0
-			current_line = []
-			for word in paragraph:
-				current_line_length += self.font_space_width
-				current_line_length += word.font.size(word.word)[0]
-				if current_line_length >= (self._rect.width - LINEINDENT - SCROLLBARWIDTH):
-					# If the current line exceeds the margins
-					lines.append(current_line)
-					current_line_length = word.font.size(word.word)[0]
-					current_line = [word]
-				else:
-					current_line.append(word)
-			lines.append(current_line) # Last remaining words appended.
-			lines.append([DataStructures.DataWord("", self.font_regular, None, None)])
+			# The breaks are measured once, and then reused by every box of the same width.
+			for pieces in LAYOUT_CACHE.breakLines(paragraph, self._rect.width - LINEINDENT - SCROLLBARWIDTH, self.font_space_width):
+				line = []
+				for index, start, end in pieces:
+					span = paragraph[index]
+					if start == 0 and end == len(span.text):
+						line.append(span)
+					else:
+						line.append(DataStructures.DataSpan(span.text[start:end], span.font, span.underline, span.color, span.spaceBefore or start > 0))
+				lines.append(tuple(line))
+			lines.append(()) # A blank line between paragraphs.
 		return lines
 	
+	def _measureText(self):
+		"""Work out how far the lines of text overflow the box, and create the scroll bar once they do."""
+		text_height = len(self._lines) * (self.font_height + LINESPACING)
+		if text_height > self._rect.height:
+			self._scrolling = True
+			self._excessTextHeight = text_height - self._rect.height
+			if self._scrollBar is None:
+				self._scrollBar = OLEScrollBar(self._rect, self)
+			else:
+				# Keep the bar level with the text, which is now longer.
+				self._scrollBar.position = int(self._scrollBar.maxPosition * (self._position / self._excessTextHeight))
+	
+	def addParagraphs(self, paragraphs):
+		"""Lay out more paragraphs below the text already in the box, such as the rest of a long page."""
+		self._message = self._message + paragraphs
+		old_text_height = len(self._lines) * (self.font_height + LINESPACING)
+		self._lines.extend(self._splitLines(paragraphs))
+		# The tile holding the old end of the text was drawn without the new lines, and the tiles below it are blank.
+		for index in list(self._tiles):
+			if index >= old_text_height // TILEHEIGHT:
+				del self._tiles[index]
+		self._measureText()
+		self._update()
+	
 	def setSurfaces(self, normalSurface, scrollSurface=None):
 		"""Switch the scroll box to a custom background (rather than single color). You can specify either a pygame.Surface object or a string of a filename to load for each of the three background appearance states."""
 		if scrollSurface is None:
@@ -629,6 +942,7 @@ class OLEScrollBox(object):
 	
 	def _update(self):
 		"""Redraw the box's Surface object. Call this method when the box has changed appearance."""
+		self._dirty = True
 		if self.customSurfaces:
 			self.surfaceNormal = pygame.transform.smoothscale(self.origSurfaceNormal, self._rect.size)
 			self.surfaceScroll = pygame.transform.smoothscale(self.origSurfaceScroll, self._rect.size)
@@ -642,20 +956,14 @@ class OLEScrollBox(object):
 		self.surfaceScroll.fill(self._bgcolor)
 		
 		# Draw message text for all bar states.
-		# Each word is blit as an surface individually.
-		line_count = 0
-		for line in self._lines:
-			word_indent = 0
-			for word in line:
-				message_surface = word.font.render(word.word, True, word.color, self._bgcolor)
-				message_rect = message_surface.get_rect()
-				message_rect.bottomleft = LINEINDENT + word_indent, int(((self.font_height + LINESPACING) * (line_count + 1)) - self._position)
-				
-				word_indent += message_surface.get_size()[0] + self.font_space_width
-				
-				self.surfaceNormal.blit(message_surface, message_rect)
-				self.surfaceScroll.blit(message_surface, message_rect)
-			line_count += 1
+		# Only the tiles of pre-rendered text which are inside the box are blit, so scrolling costs
+		# the same no matter how much text there is.
+		firstTile = int(self._position // TILEHEIGHT)
+		lastTile = int((self._position + h) // TILEHEIGHT)
+		for index in range(firstTile, lastTile + 1):
+			tile_top = int(index * TILEHEIGHT - self._position)
+			self.surfaceNormal.blit(self._tile(index), (0, tile_top))
+			self.surfaceScroll.blit(self._tile(index), (0, tile_top))
 		
 		# Draw border for the normal scroll box.
 		pygame.draw.line(self.surfaceNormal, Globals.BLACK, (0, 0), (w-1, 0)) # horizontal bar top
@@ -670,16 +978,54 @@ class OLEScrollBox(object):
 		pygame.draw.line(self.surfaceScroll, Globals.BLACK, (w-1, 0), (w-1, h-1)) # vertical bar right
 		pygame.draw.line(self.surfaceScroll, Globals.BLACK, (w-SCROLLBARWIDTH, 0), (w-SCROLLBARWIDTH, h)) # vertical line interior right (scroll bar left)
 	
-	def draw(self, surfaceObj):
-		"""Blit the current scroll box's appearance to the surface object."""
+	def _tile(self, index):
+		"""Return one tile of the text, rendering it the first time it is needed."""
+		tile = self._tiles.get(index)
+		if tile is not None:
+			return tile
+		
+		tile = pygame.Surface((self._rect.width, TILEHEIGHT))
+		tile.fill(self._bgcolor)
+		tile_top = index * TILEHEIGHT
+		line_height = self.font_height + LINESPACING
+		
+		# Each run of same-styled words on a line is blit as one surface.  Lines which straddle the edge
+		# of the tile are drawn on both tiles, and clipped by each.
+		first_line = max(0, int(tile_top // line_height) - 1)
+		last_line = min(len(self._lines), int((tile_top + TILEHEIGHT) // line_height) + 2)
+		for line_count in range(first_line, last_line):
+			span_indent = LINEINDENT
+			for span_count, span in enumerate(self._lines[line_count]):
+				# The first span on a line never has a space before it.
+				if span.spaceBefore and span_count > 0:
+					span_indent += self.font_space_width
+				message_surface = RENDER_CACHE.render(span.text, span.font, span.color, self._bgcolor)
+				message_rect = message_surface.get_rect()
+				message_rect.bottomleft = span_indent, int((line_height * (line_count + 1)) - tile_top)
+				
+				span_indent += message_surface.get_size()[0]
+				
+				tile.blit(message_surface, message_rect)
+		
+		self._tiles[index] = tile
+		return tile
+	
+	def blitList(self):
+		"""Return the (surface, rect) pairs which draw the current scroll box's appearance, in order, for Surface.blits().  The scroll bar is drawn over the box."""
+		blits = []
 		if self._visible:
 			if self._scrolling:
-				surfaceObj.blit(self.surfaceScroll, self._rect)
+				blits.append((self.surfaceScroll, self._rect))
 			else:
-				surfaceObj.blit(self.surfaceNormal, self._rect)
+				blits.append((self.surfaceNormal, self._rect))
 		
 		if self._scrolling:
-			self._scrollBar.draw(surfaceObj)
+			blits.extend(self._scrollBar.blitList())
+		return blits
+	
+	def draw(self, surfaceObj):
+		"""Blit the current scroll box's appearance to the surface object."""
+		surfaceObj.blits(self.blitList(), False)
 	
 	def handleEvent(self, eventObj):
 		if eventObj.type not in (MOUSEMOTION, MOUSEBUTTONUP, MOUSEBUTTONDOWN, SCROLLEVENT) or not self._visible:
@@ -802,6 +1148,7 @@ class OLEScrollBox(object):
 	def _propSetMessage(self, messageText):
 		self.customSurfaces = False
 		self._message = messageText
+		self._tiles = {}
 		self._update()
 	
 	def _propGetRect(self):
@@ -817,6 +1164,7 @@ class OLEScrollBox(object):
 	
 	def _propSetVisible(self, setting):
 		self._visible = setting
+		self.dirty = True
 	
 	def _propGetFgColor(self):
 		return self._fgcolor
@@ -832,6 +1180,7 @@ class OLEScrollBox(object):
 	def _propSetBgColor(self, setting):
 		self.customSurfaces = False
 		self._bgcolor = setting
+		self._tiles = {}
 		self._update()
 	
 	def _propGetFont(self):
@@ -840,6 +1189,7 @@ class OLEScrollBox(object):
 	def _propSetFont(self, setting):
 		self.customSurfaces = False
 		self._font = setting
+		self._tiles = {}
 		self._update()
 	
 	def _propGetScrolling(self):
@@ -854,6 +1204,18 @@ class OLEScrollBox(object):
 	def _propGetExcessTextHeight(self):
 		return self._excessTextHeight
 	
+	def _propGetDragging(self):
+		return self._scrolling and self._scrollBar.buttonDown
+	
+	def _propGetDirty(self):
+		# The scroll bar is drawn by the box, so the box is dirty whenever its bar is.
+		return self._dirty or (self._scrolling and self._scrollBar.dirty)
+	
+	def _propSetDirty(self, setting):
+		self._dirty = setting
+		if self._scrolling:
+			self._scrollBar.dirty = setting
+	
 	message = property(_propGetMessage, _propSetMessage)
 	rect = property(_propGetRect, _propSetRect)
 	visible = property(_propGetVisible, _propSetVisible)
@@ -864,6 +1226,8 @@ class OLEScrollBox(object):
 	position = property(_propGetPosition)
 	fontHeight = property(_propGetFontHeight)
 	excessTextHeight = property(_propGetExcessTextHeight)
+	dragging = property(_propGetDragging)
+	dirty = property(_propGetDirty, _propSetDirty)
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
 
@@ -888,6 +1252,7 @@ class OLEScrollBar(object):
 		self.mouseOverButton = False # Is the mouse currently hovering over the button?
 		self.lastMouseDownOverButton = False # Was the last mouse down event over the mouse button? (Used to track clicks.)
 		self._visible = True # Is the bar visible?
+		self.dirty = True # Has the bar's appearance changed since it was last drawn?
 		
 		self._MAXPOSITION = self._SCROLLBOXHEIGHT - self._SCROLLBARHEIGHT
 		
@@ -899,6 +1264,7 @@ class OLEScrollBar(object):
 	
 	def _update(self):
 		"""Redraw the bar's Surface object. Call this method when the bar has changed appearance."""
+		self.dirty = True
 		w = self._rect.width # syntactic sugar
 		h = self._rect.height # syntactic sugar
 		
@@ -940,15 +1306,20 @@ class OLEScrollBar(object):
 		pygame.draw.line(self.surfaceHighlight, Globals.GRAY, (3, h/2), (w - 3, h/2)) # horizontal top
 		pygame.draw.line(self.surfaceHighlight, Globals.GRAY, (3, (2*h)/3), (w - 3, (2*h)/3)) # horizontal top
 	
+	def blitList(self):
+		"""Return the (surface, rect) pairs which draw the current scroll bar's appearance, in order, for Surface.blits()."""
+		if not self._visible:
+			return []
+		if self.buttonDown:
+			return [(self.surfaceDown, self._rect)]
+		elif self.mouseOverButton:
+			return [(self.surfaceHighlight, self._rect)]
+		else:
+			return [(self.surfaceNormal, self._rect)]
+	
 	def draw(self, surfaceObj):
-		"""Blit the current button's appearance to the surface object."""
-		if self._visible:
-			if self.buttonDown:
-				surfaceObj.blit(self.surfaceDown, self._rect)
-			elif self.mouseOverButton:
-				surfaceObj.blit(self.surfaceHighlight, self._rect)
-			else:
-				surfaceObj.blit(self.surfaceNormal, self._rect)
+		"""Blit the current scroll bar's appearance to the surface object."""
+		surfaceObj.blits(self.blitList(), False)
 	
 	def handleEvent(self, eventObj):
 		if eventObj.type not in (MOUSEMOTION, MOUSEBUTTONUP, MOUSEBUTTONDOWN) or not self._visible:
@@ -956,6 +1327,7 @@ class OLEScrollBar(object):
 			return []
 		
 		retVal = []
+		lastState = (self.buttonDown, self.mouseOverButton) # The state which decides which surface is drawn.
 		
 		hasExited = False
 		if not self.mouseOverButton and self._rect.collidepoint(eventObj.pos):
@@ -1017,6 +1389,9 @@ class OLEScrollBar(object):
 			self.mouseExit(eventObj)
 			retVal.append('exit')
 		
+		if (self.buttonDown, self.mouseOverButton) != lastState:
+			self.dirty = True
+		
 		return retVal
 	
 	def mouseDrag(self, event):
@@ -1117,6 +1492,7 @@ class OLEScrollBar(object):
 	
 	def _propSetVisible(self, setting):
 		self._visible = setting
+		self.dirty = True
 	
 	def _propGetFgColor(self):
 		return self._fgcolor
@@ -1164,7 +1540,7 @@ class OLEBackground(object):
 		self._fgcolor = fgcolor
 		
 		if font is None:
-			self._font = pygame.font.Font('freesansbold.ttf', 14)
+			self._font = FONT_REGISTRY.get('freesansbold.ttf', 14)
 		else:
 			self._font = font
 		
@@ -1232,7 +1608,7 @@ class OLEInputBox(object):
 		
 		# Set up the font.
 		if font is None:
-			self._font = pygame.font.Font('freesansbold.ttf', 14)
+			self._font = FONT_REGISTRY.get('freesansbold.ttf', 14)
 		else:
 			self._font = font
 		#self.messageSurf = self._font.render(self._text, True, self._fgcolor, self._bgcolor)
@@ -1244,6 +1620,7 @@ class OLEInputBox(object):
 		self._visible = True # Is the box visible?
 		self.customSurfaces = False # Does the box start as a text button instead of having custom images for each surface?
 		self.inputString = '' # The current string typed into the input box.
+		self.dirty = True # Has the box's appearance changed since it was last drawn?
 		
 		self._action = action
 		self._event = event
@@ -1283,6 +1660,7 @@ class OLEInputBox(object):
 	
 	def _update(self):
 		"""Redraw the input box's Surface object. Call this method when the box has changed appearance."""
+		self.dirty = True
 		if self.customSurfaces:
 			self.surfaceNormal = pygame.transform.smoothscale(self.origSurfaceNormal, self._rect.size)
 			self.surfaceDark = pygame.transform.smoothscale(self.origsurfaceDark, self._rect.size)
@@ -1314,17 +1692,23 @@ class OLEInputBox(object):
 		pygame.draw.rect(self.surfaceHighlight, Globals.GRAY, pygame.Rect((1, 1, w-3, h-3)), 2) # gray inner border
 		pygame.draw.line(self.surfaceHighlight, Globals.GRAY, (2, h-2), (w-2, h-2)) # horizontal bottom
 	
+	def blitList(self):
+		"""Return the (surface, rect) pairs which draw the current box's appearance, in order, for Surface.blits()."""
+		if not self._visible:
+			return []
+		if self.active or self.mouseOverBox:
+			return [(self.surfaceHighlight, self._rect)]
+		else:
+			return [(self.surfaceNormal, self._rect)]
+	
 	def draw(self, surfaceObj):
 		"""Blit the current button's appearance to the surface object."""
-		if self._visible:
-			if self.active or self.mouseOverBox:
-				surfaceObj.blit(self.surfaceHighlight, self._rect)
-			else:
-				surfaceObj.blit(self.surfaceNormal, self._rect)
+		surfaceObj.blits(self.blitList(), False)
 	
 	
 	def handleEvent(self, eventObj):
 		retVal = []
+		lastState = (self.active, self.mouseOverBox) # The state which decides which surface is drawn.
 		
 		# This if tree handles the mouse clicking on the input box
 		if eventObj.type == MOUSEBUTTONDOWN:
@@ -1399,6 +1783,9 @@ class OLEInputBox(object):
 			retVal.append('exit')
 		"""
 		
+		if (self.active, self.mouseOverBox) != lastState:
+			self.dirty = True
+		
 		return retVal
 	
 	def submitInputText(self):
@@ -1444,6 +1831,7 @@ class OLEInputBox(object):
 	
 	def _propSetVisible(self, setting):
 		self._visible = setting
+		self.dirty = True
 	
 	def _propGetFgColor(self):
 		return self._fgcolor
@@ -1478,6 +1866,153 @@ class OLEInputBox(object):
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
 	
+def easeLinear(t):
+	"""Move at a constant speed."""
+	return t
+
+def easeInQuad(t):
+	"""Start slowly, and speed up."""
+	return t * t
+
+def easeOutQuad(t):
+	"""Start quickly, and slow down."""
+	return t * (2 - t)
+
+def easeInOutQuad(t):
+	"""Speed up through the first half, and slow down through the second."""
+	if t < 0.5:
+		return 2 * t * t
+	return -1 + (4 - 2 * t) * t
+
+def easeOutCubic(t):
+	"""Start quickly, and slow down more gently than easeOutQuad."""
+	t -= 1
+	return t * t * t + 1
+
+class OLETween(object):
+	"""
+	The class for moving a set of numbers, such as the x, y, width and height of a rect, from one
+	value to another over a fixed time.
+
+	The numbers at any moment depend only on how long ago the tween started, never on how many
+	frames have been drawn since, so an animation finishes on time at any frame rate.  The easing
+	function shapes the motion: it is given the fraction of the time which has passed, from 0 to 1,
+	and returns the fraction of the way the numbers should have moved by then.
+
+	A tween starts at the moment it is made, but moves by ANIMATOR.now, the time of the frame being
+	drawn, so every animation on screen moves in step.
+
+	Args:
+		start:		The numbers to start from.
+		goal:		The numbers to finish at.  Must be as many as start.
+		duration:	How long the tween takes, in milliseconds.
+		easing:		The easing function.  Defaults to easeLinear.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+	def __init__(self, start, goal, duration, easing=easeLinear):
+		self.start = tuple(start)
+		self.goal = tuple(goal)
+		self.duration = duration
+		self.easing = easing
+		self.startTime = ANIMATOR.clock()
+	
+	def progress(self):
+		"""Return the fraction of the tween's time which has passed by this frame, from 0 to 1."""
+		if self.duration <= 0:
+			return 1
+		return min(1, max(0, (ANIMATOR.now - self.startTime) / self.duration))
+	
+	def finished(self):
+		"""Return True once the tween's time has run out."""
+		return self.progress() >= 1
+	
+	def value(self):
+		"""Return the numbers as they are right now."""
+		fraction = self.easing(self.progress())
+		return tuple(start + (goal - start) * fraction for start, goal in zip(self.start, self.goal))
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
+class OLEAnimator(object):
+	"""
+	The class for driving every moving widget in the game from one clock.
+
+	A widget which starts moving registers itself with start().  Once per frame, tick() reads the
+	clock into now and calls animate() on every registered widget, which moves the widget to
+	where it should be by now and returns True while it still has further to go.  Widgets which
+	return False are dropped, so once everything has stopped, busy() is False and the game loop
+	can sleep until the next event.
+
+	Widgets are held weakly, so a widget on a page which has been thrown away stops animating by
+	itself.
+
+	Time is read from clock, in milliseconds.  It is pygame.time.get_ticks() unless it is
+	replaced, such as to step animations by a fixed time per frame.
+
+	Args:
+		nothing
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+	clock = staticmethod(pygame.time.get_ticks)
+	
+	def __init__(self):
+		self.now = 0 # The time of the frame being drawn.
+		self._animations = [] # Weak references to every moving widget, in the order they started.
+	
+	def start(self, widget):
+		"""Call widget.animate() every frame from now on, until it returns False."""
+		for reference in self._animations:
+			if reference() is widget:
+				return
+		self._animations.append(weakref.ref(widget))
+	
+	def tick(self):
+		"""Advance every moving widget to the current time.  Called once per frame, before the page is drawn."""
+		self.now = self.clock()
+		live = []
+		for reference in self._animations:
+			widget = reference()
+			if widget is not None and widget.animate():
+				live.append(reference)
+		self._animations = live
+	
+	def busy(self):
+		"""Return True if anything is still moving, and so needs every frame drawn."""
+		return self.active > 0
+	
+	def counts(self):
+		"""Return how many widgets of each class are moving, keyed by class name."""
+		counts = collections.Counter()
+		for reference in self._animations:
+			widget = reference()
+			if widget is not None:
+				counts[type(widget).__name__] += 1
+		return counts
+	
+	def clear(self):
+		"""Stop driving every widget.  They stay wherever they are."""
+		self._animations = []
+	
+	def _propGetActive(self):
+		return len([reference for reference in self._animations if reference() is not None])
+	
+	active = property(_propGetActive)
+
+# The scheduler which every animation shares.
+ANIMATOR = OLEAnimator()
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
+
 class OLECard(object):
 	"""
 	The class for an action card.
@@ -1525,7 +2060,7 @@ class OLECard(object):
 		
 		# Set up the font.
 		if font is None:
-			self._font = pygame.font.Font('freesansbold.ttf', 14)
+			self._font = FONT_REGISTRY.get('freesansbold.ttf', 14)
 		else:
 			self._font = font
 		#self.messageSurf = self._font.render(self._text, True, self._fgcolor, self._bgcolor)
@@ -1533,8 +2068,6 @@ class OLECard(object):
 		# Shapes the card uses.
 		self.small_card = pygame.Rect(self._rect.x, self._rect.y, self._rect.w, self._rect.h)
 		self.large_card = pygame.Rect(self._rect.x + 50, self._rect.y - 178, 128, 178)
-		self.goal_rect = pygame.Rect(0, 0, 0, 0)
-		self.old_rect = pygame.Rect(self._rect.x, self._rect.y, self._rect.w, self._rect.h)
 		#self.placeholder_space = pygame.Rect(self._rect.x, self._rect.y, self._rect.w, self._rect.h)
 		
 		# Tracks the state of the card.
@@ -1547,13 +2080,12 @@ class OLECard(object):
 		self.lastMouseDownOverCard = False # Was the last mouse down event over the card? (Used to track clicks.)
 		self._visible = True # Is the card visible?
 		self.customSurfaces = False # Does the card start as a text button instead of having custom images for each surface?
+		self._dirty = True # Has the card's appearance changed since it was last drawn?
 		
 		# Technical variables
 		self._action = action
 		self._event = event
-		self.animation_time = 0
-		self.animation_frames = self.animation_time * Globals.FPS
-		self.current_frame = self.animation_frames
+		self._tween = None # Moves the card's rect while it is transiting.
 		
 		if normal is None:
 			# Create the surfaces for a card.
@@ -1593,14 +2125,15 @@ class OLECard(object):
 		self._rect = pygame.Rect((self._rect.left, self._rect.top, self.surfaceNormal.get_width(), self.surfaceNormal.get_height()))
 	
 	def _update(self):
-		"""Redraw the card's Surface object. Call this method when the card has changed appearance."""
+		"""Redraw the card's Surface object. Call this method when the card has changed appearance.  Moving the card does not change its appearance; the faces drawn here are only rescaled."""
+		self._dirty = True
 		# Fill background color for all card states.
 		self.origSurfaceNormal.fill(self._bgcolor)
 		self.origSurfaceDark.fill(self._bgcolor)
 		self.origSurfaceFlipped.fill(self._bgcolor)
 
 		# Draw card title text for all card states.
-		titleSurf = self._font.render(self._card._name, True, self._fgcolor, self._bgcolor)
+		titleSurf = self._font.render(self._card.name, True, self._fgcolor, self._bgcolor)
 		titleRect = titleSurf.get_rect()
 		titleRect.center = int(self.large_card.w / 2), int(self.large_card.h / 8)
 		self.origSurfaceNormal.blit(titleSurf, titleRect)
@@ -1609,7 +2142,7 @@ class OLECard(object):
 
 		# Draw card flavor text for all card states.
 		# TODO: Make the flavor text wrap
-		flavorTextSurf = self._font.render(self._card._flavor_text, True, self._fgcolor, self._bgcolor)
+		flavorTextSurf = self._font.render(self._card.flavorText, True, self._fgcolor, self._bgcolor)
 		flavorTextRect = flavorTextSurf.get_rect()
 		flavorTextRect.center = int(self.large_card.w / 2), int(self.large_card.h / 2)
 		self.origSurfaceNormal.blit(flavorTextSurf, flavorTextRect)
@@ -1617,44 +2150,49 @@ class OLECard(object):
 		self.origSurfaceFlipped.blit(flavorTextSurf, flavorTextRect)
 
 		# Any drawing on the card's surfaces must occur before this line.
-		# Animate the card moving.
-		if (self.transiting):
-			# Adjust the card's features linearly with time, over the desired timeline.
-			# TODO: These functions will need to change for parabolic movement to be possible.
-			self._rect.x = self.old_rect.x + ((self.goal_rect.x - self.old_rect.x) * ((self.animation_frames - self.current_frame) / self.animation_frames))
-			self._rect.y = self.old_rect.y + ((self.goal_rect.y - self.old_rect.y) * ((self.animation_frames - self.current_frame) / self.animation_frames))
-			self._rect.width = self.old_rect.width + ((self.goal_rect.width - self.old_rect.width) * ((self.animation_frames - self.current_frame) / self.animation_frames))
-			self._rect.height = self.old_rect.height + ((self.goal_rect.height - self.old_rect.height) * ((self.animation_frames - self.current_frame) / self.animation_frames))
-			self.current_frame -= 1
-
-			if self.current_frame <= 0:
-				# Cease animation.
-				self.transiting = False
-				# Achieve the desired location and size.
-				self._rect.x = self.goal_rect.x
-				self._rect.y = self.goal_rect.y
-				self._rect.w = self.goal_rect.w
-				self._rect.h = self.goal_rect.h
-				# Toggle selecting state, if relevant
-				if self.selecting:
-					self.selected = not self.selected
-					self.selecting = False
-		
-		# Squash and stretch the original custom images or the fabricated images.
-		self.surfaceNormal = pygame.transform.smoothscale(self.origSurfaceNormal, self._rect.size)
-		self.surfaceDark = pygame.transform.smoothscale(self.origSurfaceDark, self._rect.size)
-		self.surfaceFlipped = pygame.transform.smoothscale(self.origSurfaceFlipped, self._rect.size)
+		self._scale()
+	
+	def _scale(self, shownOnly=False):
+		"""Squash and stretch the original custom images or the fabricated images to the card's current size.  While the card moves, only the face being shown is scaled."""
+		if not shownOnly or not self.flipped:
+			self.surfaceNormal = pygame.transform.smoothscale(self.origSurfaceNormal, self._rect.size)
+		if not shownOnly:
+			self.surfaceDark = pygame.transform.smoothscale(self.origSurfaceDark, self._rect.size)
+		if not shownOnly or self.flipped:
+			self.surfaceFlipped = pygame.transform.smoothscale(self.origSurfaceFlipped, self._rect.size)
+	
+	def blitList(self):
+		"""Return the (surface, rect) pairs which draw the card's current appearance, in order, for Surface.blits()."""
+		if not self._visible:
+			return []
+		if self.flipped:
+			return [(self.surfaceFlipped, self._rect)]
+		else:
+			return [(self.surfaceNormal, self._rect)]
 	
 	def draw(self, surfaceObj):
 		"""Blit the card's current appearance to the surface object."""
-		if self.transiting:
-			self._update()
-
-		if self._visible:
-			if self.flipped:
-				surfaceObj.blit(self.surfaceFlipped, self._rect)
-			else:
-				surfaceObj.blit(self.surfaceNormal, self._rect)		
+		surfaceObj.blits(self.blitList(), False)
+	
+	def animate(self):
+		"""Move the card to where its tween says it should be by now, if it is moving.  Return True if it has further to go.  Called by ANIMATOR."""
+		if not self.transiting:
+			return False
+		self._dirty = True
+		if self._tween.finished():
+			# Cease animation, and achieve the desired location and size.
+			self.transiting = False
+			self._rect = pygame.Rect(self._tween.goal)
+			self._tween = None
+			# Toggle selecting state, if relevant
+			if self.selecting:
+				self.selected = not self.selected
+				self.selecting = False
+			self._scale()
+		else:
+			self._rect = pygame.Rect(self._tween.value())
+			self._scale(shownOnly=True)
+		return self.transiting
 	
 	def handleEvent(self, eventObj):
 		if eventObj.type not in (MOUSEMOTION, MOUSEBUTTONUP, MOUSEBUTTONDOWN) or not self._visible:
@@ -1715,11 +2253,11 @@ class OLECard(object):
 	def mouseClick(self, event):
 		if event.button == 1: # Left click.
 			if self.selected:
-				self.move(0.5, self.small_card)
+				self.move(0.5, self.small_card, easeInOutQuad)
 				self.selecting = True
 				print("Small Card: " + str(self.small_card.x) + ", " + str(self.small_card.y) + ", " + str(self.small_card.w) + ", " + str(self.small_card.h))
 			else:
-				self.move(0.5, self.large_card)
+				self.move(0.5, self.large_card, easeInOutQuad)
 				self.selecting = True
 				print("Large Card: " + str(self.large_card.x) + ", " + str(self.large_card.y) + ", " + str(self.large_card.w) + ", " + str(self.large_card.h))
 			#if self._action != None:
@@ -1727,22 +2265,14 @@ class OLECard(object):
 			#elif self._event != None:
 			#	pygame.event.post(self._event)
 	
-	def move(self, seconds, rectangle):
-		# Begin the animation
-		self.transiting = True
-		# Reset the animation timing tracker variables with current data
-		self.animation_time = seconds
-		self.animation_frames = self.animation_time * Globals.FPS
-		self.current_frame = self.animation_frames
-		self.old_rect = pygame.Rect(self._rect.x, self._rect.y, self._rect.w, self._rect.h)
-
+	def move(self, seconds, rectangle, easing=easeLinear):
+		"""Start moving and resizing the card to fill rectangle, taking the given number of seconds whatever the frame rate."""
 		if rectangle is None:
 			raise Exception("Cannot move to nonexistant rectangle!")
-		else:
-			self.goal_rect.x = rectangle.x
-			self.goal_rect.y = rectangle.y
-			self.goal_rect.w = rectangle.w
-			self.goal_rect.h = rectangle.h
+		# Begin the animation from wherever the card is now, even part way through another move.
+		self.transiting = True
+		self._tween = OLETween(self._rect, rectangle, seconds * 1000, easing)
+		ANIMATOR.start(self)
 	
 	def mouseEnter(self, event):
 		pass # This class is meant to be overridden.
@@ -1758,6 +2288,19 @@ class OLECard(object):
 	
 	def mouseUp(self, event):
 		pass # This class is meant to be overridden.
+	
+	def _propGetRect(self):
+		return self._rect
+	
+	def _propGetDirty(self):
+		# A moving card changes every frame.
+		return self._dirty or self.transiting
+	
+	def _propSetDirty(self, setting):
+		self._dirty = setting
+	
+	rect = property(_propGetRect)
+	dirty = property(_propGetDirty, _propSetDirty)
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -  - - - - - -
 
@@ -1799,6 +2342,7 @@ class OLEImage(object):
 		# Tracks the state of the image.
 		self._visible = True # Is the button visible?
 		self._bordered = border # Does the image have a border?
+		self.dirty = True # Has the image's appearance changed since it was last drawn?
 		
 		# Pre-render the image.
 		self.surfaceNormal = None
@@ -1809,6 +2353,7 @@ class OLEImage(object):
 	
 	def _update(self):
 		"""Redraw the image's Surface object. Call this method when the image has changed appearance."""
+		self.dirty = True
 		if (self._rect.width == self.surfaceNormal.width) and (self._rect.height == self.surfaceNormal.height):
 			self.surfaceNormal = self.imageSurface
 		else:
@@ -1830,7 +2375,17 @@ class OLEImage(object):
 		
 		# Animate a GIF.
 	
+	def blitList(self):
+		"""Return the (surface, rect) pairs which draw the current image's appearance, in order, for Surface.blits()."""
+		if not self._visible:
+			return []
+		return [(self.surfaceNormal, self._rect)]
+	
 	def draw(self, surfaceObj):
 		"""Blit the current image's appearance to the surface object."""
-		if self._visible:
-			surfaceObj.blit(self.surfaceNormal, self._rect)
\ No newline at end of file
+		surfaceObj.blits(self.blitList(), False)
+	
+	def _propGetRect(self):
+		return self._rect
+	
+	rect = property(_propGetRect)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import weakref
+
+
+class VariableStore(dict):
+	"""
+	The class for holding the exposed variables, and telling whoever is interested when they change.
+
+	The store is a dict, so reading a variable, testing for one and looping over them all work
+	exactly as they always have.  Setting a variable to a new value also bumps the store's version
+	counter, records the version at which that variable changed, and calls every callback which
+	subscribed to it (or to every variable).  Setting a variable to a value equal to the one it
+	already holds changes nothing and calls nobody.
+
+	Values must be replaced rather than changed in place (store['Strength'] = [12, True], not
+	store['Strength'][0] = 12), or nobody will hear about the change.
+
+	Args:
+		Anything dict() accepts, as the starting variables.
+
+	Returns:
+		nothing
+
+	Raises:
+		nothing
+	"""
+
+	def __init__(self, *args, **kwargs):
+		dict.__init__(self, *args, **kwargs)
+		self.version = 0  # Bumped every time any variable changes.
+		self._versions = dict.fromkeys(self, 0)  # The version at which each variable last changed, keyed by name.
+		self._subscribers = {}  # Weak references to callbacks, keyed by variable name, or None for every variable.
+
+	def __setitem__(self, name, value):
+		if name in self:
+			oldValue = dict.__getitem__(self, name)
+			# The same object set again may have been changed in place, so it always counts as a change.
+			if oldValue is not value and oldValue == value:
+				return
+		dict.__setitem__(self, name, value)
+		self._changed(name, value)
+
+	def __delitem__(self, name):
+		dict.__delitem__(self, name)
+		self._changed(name, None)
+
+	def update(self, *args, **kwargs):
+		"""Set every variable given, exactly as if each had been set on its own."""
+		for name, value in dict(*args, **kwargs).items():
+			self[name] = value
+
+	def setdefault(self, name, value=None):
+		"""Return the named variable, setting it to value first if it does not exist yet."""
+		if name not in self:
+			self[name] = value
+		return dict.__getitem__(self, name)
+
+	def pop(self, name, *default):
+		"""Remove the named variable and return its value."""
+		if name not in self:
+			return dict.pop(self, name, *default)
+		value = dict.pop(self, name)
+		self._changed(name, None)
+		return value
+
+	def clear(self):
+		"""Remove every variable."""
+		for name in list(self):
+			del self[name]
+
+	def versionOf(self, name):
+		"""Return the version at which the named variable last changed, or None if it never existed."""
+		return self._versions.get(name)
+
+	def subscribe(self, name, callback):
+		"""Call callback(name, value) whenever the named variable changes, or whenever any variable changes if name is None.  value is None if the variable was removed.  Bound methods are held weakly, so an object which is thrown away stops listening by itself."""
+		if hasattr(callback, '__self__'):
+			reference = weakref.WeakMethod(callback)
+		else:
+			reference = lambda: callback
+		# Forget the callbacks of objects which no longer exist, so that a variable which never changes does not collect them.
+		references = [live for live in self._subscribers.get(name, []) if live() is not None]
+		references.append(reference)
+		self._subscribers[name] = references
+
+	def unsubscribe(self, name, callback):
+		"""Stop calling callback when the named variable changes."""
+		references = self._subscribers.get(name, [])
+		self._subscribers[name] = [reference for reference in references if reference() not in (None, callback)]
+
+	def _changed(self, name, value):
+		"""Bump the versions, and call everyone who subscribed to the variable."""
+		self.version += 1
+		self._versions[name] = self.version
+		for key in (name, None):
+			references = self._subscribers.get(key)
+			if not references:
+				continue
+			# Forget the callbacks of objects which no longer exist.
+			live = [reference for reference in references if reference() is not None]
+			self._subscribers[key] = live
+			for reference in live:
+				callback = reference()
+				if callback is not None:
+					callback(name, value)
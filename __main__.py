@@ -8,6 +8,10 @@ import Globals
 Globals.init()
 from UIElements import *
 from DataStructures import *
+from StoryLoader import *
+from SaveWriter import *
+from SaveStore import *
+import Benchmark
 
 
 class App:
@@ -35,12 +39,24 @@ class App:
 		self.targetFrameTime = 1000/Globals.FPS
 		self.size = self.display_width, self.display_height = 800, 600  # Default size, overwritten by readSettings()
 
-		self._story = '' # Root node of the story xml tree
+		self._stories = StoryRegistry() # Every Story file, loaded in the background
+		self._story = None # The loaded Story, with its pages indexed by name
 		self._page = '' # Page currently being displayed
+		self._prefetcher = PagePrefetcher(lambda pageName: self.buildPage(pageName, self.display_width, self.display_height))
+		self._compositor = OLECompositor() # Tracks which parts of the display need redrawing
+		self._saves = SaveWriter() # Writes save files in the background
+		self._autosave_time = None # When the last autosave was taken, in ticks
+		self._slots = None # Every save slot, opened by on_init()
+		self._playtime = 0 # Seconds played before _playtime_start
+		self._playtime_start = 0 # When this game was started or loaded, in ticks
 
 
 	def on_init(self):
 		"""Initialize all PyGame modules, read in files, and load the first page."""
+		# Start loading every story in the background, while the start menu is shown
+		if Globals.STORY_PRELOAD:
+			self._stories.discover()
+
 		# Read in the game settings
 		self.readSettings()
 
@@ -51,11 +67,23 @@ class App:
 		Globals.PLAYER_CHARACTER = Character(os.path.join(Globals.SAVES_PATH, 'savedata.xml'), Globals.STATS_DICT)
 		Globals.EXPOSED_VARIABLES["PC Name"] = Globals.PLAYER_CHARACTER.name
 
+		# Open the save slots
+		self._slots = SaveStore(os.path.join(Globals.SAVES_PATH, Globals.SAVE_DATABASE))
+
 		# Initialize game components
+		if Globals.HEADLESS:
+			# SDL must be told before it starts that there is no screen or sound card to use.
+			os.environ['SDL_VIDEODRIVER'] = 'dummy'
+			os.environ['SDL_AUDIODRIVER'] = 'dummy'
 		pygame.init()
-		self._game_display_surf = pygame.display.set_mode((self.display_width, self.display_height))
+		if Globals.HEADLESS:
+			# Pages are drawn exactly as usual, but into a surface which is never shown.
+			self._game_display_surf = pygame.Surface((self.display_width, self.display_height))
+		else:
+			self._game_display_surf = pygame.display.set_mode((self.display_width, self.display_height))
 		pygame.font.init()
 		pygame.display.set_caption('OpenLewdEngine')
+		self._playtime_start = pygame.time.get_ticks()
 		self._running = True
 
 		# Set up the first page
@@ -71,22 +99,33 @@ class App:
 			# This for loop modifies the exposed variables to the values indicated by the event dictionary's key-value pairs.
 			for eventKey, eventValue in event.dict.items():
 				# The "name" key is always reserved for the name of the event, so it can be skipped.
-				if eventKey != 'name':
-					for exposedKey, exposedValue in Globals.EXPOSED_VARIABLES.items():
-						if eventKey == exposedKey:
-							Globals.EXPOSED_VARIABLES[exposedKey] = eventValue
+				# Only variables which are already exposed can be set.
+				if eventKey != 'name' and eventKey in Globals.EXPOSED_VARIABLES:
+					Globals.EXPOSED_VARIABLES[eventKey] = eventValue
 			# This if-tree either turns the page or loads a new story.
 			if event.name.find('.xml') == -1:
 				self.turnPage(event.name, self.display_width, self.display_height)
 			else:
 				self.readStory(event.name, self.display_width, self.display_height)
+			self.autosave()
 		elif event.type == Globals.SAVE:
 			#TEST\/
 			Globals.PLAYER_CHARACTER._addStat('NEWSTAT', '9999')
 			Globals.PLAYER_CHARACTER._addStat('Strength', '10', override=True)
 			Globals.PLAYER_CHARACTER._addStat('TWOSTAT', 8888)
 			#TEST^
-			self.saveGame(os.path.join(Globals.SAVES_PATH, 'savedata.xml'))
+			self.saveGame(event.dict.get('slot', Globals.SAVE_SLOT))
+		elif event.type == Globals.SAVED:
+			if event.error is not None:
+				print("Cannot write the save file {0}!  Error: {1}".format(event.path, event.error))
+			elif event.slot != Globals.AUTOSAVE_SLOT:
+				# Autosaves are quiet unless they fail.
+				print('...saved!')
+		elif event.type == Globals.LOAD:
+			self.loadGame(event.dict.get('slot'))
+		elif event.type == pygame.VIDEOEXPOSE:
+			# The window was uncovered, so whatever was on it may be gone.
+			self._compositor.reset()
 		else:
 		#if event.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP, pygame.MOUSEBUTTONDOWN, SCROLLEVENT):
 			self._page.handleEvent(event)
@@ -98,18 +137,45 @@ class App:
 		self.clock.tick()
 		timeDif = self.targetFrameTime - self.clock.get_rawtime()
 		if timeDif > 0:
-			pygame.time.wait(int(timeDif))
+			# Spend some of the spare time building the pages the player might turn to next, but only
+			# while nothing on screen moves, as a build which outlasts its estimate would drop a frame.
+			if Globals.PREFETCH and not (self._page.isBusy() or ANIMATOR.busy()):
+				prefetchStart = pygame.time.get_ticks()
+				self._prefetcher.work(timeDif)
+				timeDif -= pygame.time.get_ticks() - prefetchStart
+			if timeDif > 0:
+				pygame.time.wait(int(timeDif))
 
 
 	def on_render(self):
 		"""Renders the game elements."""
-		self._game_display_surf.fill(Globals.BLACK)  # Black out the whole display to prevent ghosting.
-		self._page.draw(self._game_display_surf)  # Redraw all elements on the screen.
-		pygame.display.update()
+		self._page.animate()
+		ANIMATOR.tick()
+		if Globals.DIRTY_RECTS:
+			# Redraw only the parts of the screen which changed.
+			rects = self._compositor.render(self._page, self._game_display_surf)
+		else:
+			self._game_display_surf.fill(Globals.BLACK)  # Black out the whole display to prevent ghosting.
+			self._page.draw(self._game_display_surf)  # Redraw all elements on the screen.
+			rects = None
+
+		# Without a window there is nothing to update; the frame stays in the off-screen surface.
+		if Globals.HEADLESS:
+			return
+		if rects is None:
+			pygame.display.update()
+		elif rects:
+			pygame.display.update(rects)
 
 
 	def on_cleanup(self):
 		"""Executes all necessary final orders before quitting."""
+		self._saves.shutdown()  # A save which has been started is always finished.
+		self._slots.close()
+		self._stories.shutdown()
+		RENDER_CACHE.clear()
+		LAYOUT_CACHE.clear()
+		FONT_REGISTRY.clear()  # Fonts must be released before the font module shuts down.
 		pygame.quit()
 
 
@@ -124,32 +190,82 @@ class App:
 		# The Game Loop:
 		while(self._running):
 			self.on_loop()
+			if Globals.IDLE_WAIT and not self.isBusy():
+				# Nothing will change until the player does something, so sleep until they do.
+				event = pygame.event.wait(Globals.IDLE_TIMEOUT)
+				if event.type != pygame.NOEVENT:
+					self.on_event(event)
 			for event in pygame.event.get():
 				self.on_event(event)
 
 		self.on_cleanup()
 
 
+	def isBusy(self):
+		"""Return True if the next frame is needed on time, because something on the page is moving or pages are waiting to be prefetched."""
+		if self._page.isBusy() or ANIMATOR.busy():
+			return True
+		return Globals.PREFETCH and self._prefetcher.busy()
+
+
 	def turnPage(self, pageName, gameWidth, gameHeight):
-		"""Function for changing to a different Page within a Story.  Also hard-defines which kinds of pages can be created."""
-		storyRoot = self._story.getroot()
-		for page in storyRoot.findall('page'):
-			if page.attrib['name'] == pageName:
-				if page.attrib['type'] == 'text':
-					self._page = StoryPage(page, storyRoot, gameWidth, gameHeight)
-					self._game_display_surf.fill(Globals.BLACK)
-				elif page.attrib['type'] == 'menu':
-					self._page = MenuPage(page, storyRoot, gameWidth, gameHeight)
-					self._game_display_surf.fill(Globals.BLACK)
-				elif page.attrib['type'] == 'duel':
-					self._page = DuelPage(page, storyRoot, gameWidth, gameHeight)
-					self._game_display_surf.fill(Globals.BLACK)
+		"""Function for changing to a different Page within a Story.  A page which has already been prefetched is swapped straight in."""
+		page = self._prefetcher.take(self._story, pageName)
+		if page is None:
+			page = self.buildPage(pageName, gameWidth, gameHeight)
+		if page is None:
+			return
+
+		self._page = page
+		self._compositor.reset()  # A new page is drawn over the whole screen.
+
+		# Queue up the pages this one leads to.
+		if Globals.PREFETCH:
+			self._prefetcher.plan(self._story, self._story.page(pageName))
+
+
+	def autosave(self):
+		"""Save the game in the background, if autosaving is on and the last autosave is at least Globals.AUTOSAVE_INTERVAL old.  Only the snapshot is taken on this frame."""
+		if not Globals.AUTOSAVE or not self._page:
+			return
+		now = pygame.time.get_ticks()
+		if self._autosave_time is not None and now - self._autosave_time < Globals.AUTOSAVE_INTERVAL:
+			return
+		self._autosave_time = now
+		self._saves.saveSlot(self._slots, Globals.AUTOSAVE_SLOT, self.snapshot())
+
+
+	def snapshot(self):
+		"""Return a copy of everything a save holds: the player character, the exposed variables, the page being shown and the time played."""
+		snapshot = Globals.PLAYER_CHARACTER.snapshot()
+		# Exposed variables are always replaced, never changed in place, so a shallow copy cannot see later changes.
+		snapshot['variables'] = dict(Globals.EXPOSED_VARIABLES)
+		snapshot['location'] = (self._story.name, self._page.name)
+		snapshot['playtime'] = self._playtime + (pygame.time.get_ticks() - self._playtime_start) / 1000
+		snapshot['savedAt'] = time.time()
+		return snapshot
+
+
+	def buildPage(self, pageName, gameWidth, gameHeight):
+		"""Function for building a Page of the current Story without displaying it.  Also hard-defines which kinds of pages can be created."""
+		page = self._story.page(pageName)
+		if page is None:
+			print("Cannot find page {0} in story {1}!".format(pageName, self._story.name))
+			return None
+
+		if page.type == 'text':
+			return StoryPage(page, self._story, gameWidth, gameHeight)
+		elif page.type == 'menu':
+			return MenuPage(page, self._story, gameWidth, gameHeight)
+		elif page.type == 'duel':
+			return DuelPage(page, self._story, gameWidth, gameHeight)
+		return None
 
 
 	def readStory(self, storyName, gameWigth, gameHeight):
 		"""Function for changing to (and displaying) a different Story file."""
 		try:
-			self._story = ET.parse(os.path.join(Globals.STORY_PATH, storyName), Globals.PARSER)
+			self._story = self._stories.load(storyName)
 		except IOError as err:
 			print("IOError: Cannot find or open {0}!  Error: {1}".format(storyName, err))
 
@@ -184,8 +300,9 @@ class App:
 
 		# Set up the story XML from the file indicated by Settings.XML
 		for story in root.findall('story'):
+			storyName = story.find('filename').text
 			try:
-				self._story = ET.parse(os.path.join(Globals.STORY_PATH, story.find('filename').text), Globals.PARSER)
+				self._story = self._stories.load(storyName)
 			except IOError as err:
 				print("IOError: Cannot find or open {0}!  Error: {1}".format(storyName, err))
 
@@ -217,14 +334,49 @@ class App:
 						Globals.STATS_DICT[stat.attrib['name']] = [0, False]
 
 
-	def saveGame(self, filePath):
-		"""Write one XML save file, containing the player character data and the larger
-		game state, into Saves folder."""
+	def saveGame(self, slotName):
+		"""Write one save slot, containing the player character data and the larger game
+		state, into the save database.  The slot is written in the background, and a SAVED
+		event arrives once it is done.  SaveStore.exportXML() writes a slot out as an XML
+		save file."""
 		print('Saving...')
-		Globals.PLAYER_CHARACTER._writeSave(filePath)
-		print('...saved!')
+		self._saves.saveSlot(self._slots, slotName, self.snapshot())
+
+
+	def loadGame(self, slotName=None):
+		"""Restore the game from a save slot, or from the most recently saved slot if slotName is None, and turn to the page it was saved on."""
+		if slotName is None:
+			slots = self._slots.slots()
+			if not slots:
+				print("There are no saved games to load!")
+				return
+			slotName = slots[0].name
+		snapshot = self._slots.load(slotName)
+		if snapshot is None:
+			print("Cannot find the save slot {0}!".format(slotName))
+			return
+
+		Globals.PLAYER_CHARACTER.restore(snapshot)
+		Globals.EXPOSED_VARIABLES["PC Name"] = Globals.PLAYER_CHARACTER.name
+		Globals.EXPOSED_VARIABLES.update(snapshot.get('variables', {}))
+		self._playtime = snapshot.get('playtime', 0)
+		self._playtime_start = pygame.time.get_ticks()
+
+		if 'location' in snapshot:
+			storyName, pageName = snapshot['location']
+			try:
+				self._story = self._stories.load(storyName)
+			except IOError as err:
+				print("IOError: Cannot find or open {0}!  Error: {1}".format(storyName, err))
+				return
+			self.turnPage(pageName, self.display_width, self.display_height)
 
 
 if __name__ == "__main__":
+	if '--headless' in sys.argv[1:] or '--benchmark' in sys.argv[1:]:
+		Globals.HEADLESS = True
 	theApp = App()
-	theApp.on_execute()
+	if '--benchmark' in sys.argv[1:]:
+		Benchmark.run(theApp, sys.argv[1:])
+	else:
+		theApp.on_execute()
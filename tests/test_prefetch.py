@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import Globals
+Globals.init()
+from DataStructures import PagePrefetcher
+
+
+class FakePageData:
+	"""Just enough of a PageData for PagePrefetcher.plan(): a button to every linked page."""
+	def __init__(self, links):
+		self.buttons = [('Go', str(number), link) for number, link in enumerate(links)]
+
+
+class FakeStory:
+	"""A Story which is only a dict of FakePageData."""
+	def __init__(self, pages):
+		self.pages = dict((name, FakePageData(links)) for name, links in pages.items())
+
+	def page(self, pageName):
+		return self.pages.get(pageName)
+
+
+class FakePage:
+	"""A built page, which takes as long to build as the bundled pages do."""
+	def __init__(self, name, buildTime):
+		time.sleep(buildTime / 1000)
+		self.name = name
+
+	def surfaceBytes(self):
+		return 1024
+
+	def isStale(self):
+		return False
+
+
+class PagePrefetcherTest(unittest.TestCase):
+
+	def setUp(self):
+		Globals.PREFETCH_TIME_BUDGET = 8
+		Globals.PREFETCH_REPROBE_FRAMES = 30
+		self.story = FakeStory({
+			'start': ['a', 'b', 'c'],
+			'a': ['d', 'e', 'start'],
+			'b': [], 'c': [], 'd': [], 'e': []
+		})
+		self.built = []
+
+	def build(self, pageName):
+		self.built.append(pageName)
+		return FakePage(pageName, 15)
+
+	def runFrames(self, prefetcher, frames, spareTime=14):
+		"""Call work() once per frame, the way App.on_loop does, until nothing is pending."""
+		for frame in range(frames):
+			if not prefetcher.busy():
+				return frame
+			prefetcher.work(spareTime)
+		return frames
+
+	def testPagesSlowerThanTheBudgetAreStillPrefetched(self):
+		prefetcher = PagePrefetcher(self.build)
+		prefetcher.plan(self.story, self.story.page('start'))
+		self.runFrames(prefetcher, 200)
+		self.assertEqual(sorted(prefetcher.ready), ['a', 'b', 'c'])
+
+		# The estimate is now well over the budget, but the next page's links are prefetched too.
+		self.assertGreater(prefetcher.buildTime(), Globals.PREFETCH_TIME_BUDGET)
+		self.assertIsNotNone(prefetcher.take(self.story, 'a'))
+		prefetcher.plan(self.story, self.story.page('a'))
+		self.runFrames(prefetcher, 200)
+		self.assertEqual(sorted(prefetcher.ready), ['d', 'e', 'start'])
+
+	def testSlowBuildsWaitBetweenFrames(self):
+		prefetcher = PagePrefetcher(self.build)
+		prefetcher.plan(self.story, self.story.page('start'))
+		prefetcher.work(14)
+		self.assertEqual(self.built, ['a'])
+
+		# Only one slow page is built per Globals.PREFETCH_REPROBE_FRAMES frames.
+		for frame in range(Globals.PREFETCH_REPROBE_FRAMES):
+			prefetcher.work(14)
+		self.assertEqual(self.built, ['a'])
+		prefetcher.work(14)
+		self.assertEqual(self.built, ['a', 'b'])
+
+	def testBuildsWhichFitAreNotHeldBack(self):
+		prefetcher = PagePrefetcher(lambda pageName: FakePage(pageName, 1))
+		prefetcher.plan(self.story, self.story.page('start'))
+		self.assertEqual(self.runFrames(prefetcher, 200), 1)
+		self.assertEqual(sorted(prefetcher.ready), ['a', 'b', 'c'])
+
+	def testPagesWhichFailToBuildAreDropped(self):
+		def build(pageName):
+			if pageName == 'b':
+				raise IOError('No file Images/missing.png')
+			return FakePage(pageName, 1)
+		prefetcher = PagePrefetcher(build)
+		prefetcher.plan(self.story, self.story.page('start'))
+		self.runFrames(prefetcher, 200)
+		self.assertEqual(sorted(prefetcher.ready), ['a', 'c'])
+		self.assertFalse(prefetcher.busy())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import Globals
+Globals.init()
+import StoryLoader
+from DataStructures import Story
+from StoryLoader import StreamingStory, loadStory
+
+# Page tags hide in a comment before the root, in CDATA, in a comment inside a page and in an attribute.
+TRICKY_STORY = b'''<?xml version="1.0" encoding="UTF-8"?>
+<!-- An old page, kept for reference: <page type="text" name="commented"> -->
+<story>
+	<page type="text" name="start">
+		<paragraph number="0"><![CDATA[A </page> inside CDATA, and a <page name="x"> too.]]></paragraph>
+		<!-- </page> -->
+		<button><message>Go</message><location>1</location><transition>end</transition></button>
+	</page>
+	<page type="text" name="end" note="a > b"><paragraph number="0">The end.</paragraph></page>
+	<page type="text" name="empty"/>
+	<point name="who"><variable>PC Name</variable></point>
+</story>
+'''
+
+# Not UTF-8, with an entity which only the DOCTYPE defines.
+LATIN1_STORY = u'''<?xml version="1.0" encoding="ISO-8859-1"?>
+<!DOCTYPE story [
+	<!ENTITY hero "Renée">
+	<!ENTITY unused "<page type='text' name='trap'/>">
+]>
+<story>
+	<page type="text" name="start"><paragraph number="0">Café &hero;</paragraph></page>
+</story>
+'''.encode('latin-1')
+
+
+class StreamingStoryTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.chunkSize = StoryLoader.SCAN_CHUNK_SIZE
+
+	def tearDown(self):
+		StoryLoader.SCAN_CHUNK_SIZE = self.chunkSize
+		shutil.rmtree(self.folder)
+
+	def write(self, fileName, data):
+		path = os.path.join(self.folder, fileName)
+		with open(path, 'wb') as storyFile:
+			storyFile.write(data)
+		return path
+
+	def checkTrickyStory(self, story):
+		self.assertEqual(sorted(story.offsets), ['empty', 'end', 'start'])
+		self.assertEqual(story.page('start').paragraphs, [(0, 'A </page> inside CDATA, and a <page name="x"> too.')])
+		self.assertEqual(story.page('start').buttons, [('Go', '1', 'end')])
+		self.assertEqual(story.page('end').paragraphs, [(0, 'The end.')])
+		self.assertEqual(story.page('empty').paragraphs, [])
+		self.assertIn('who', story.points)
+
+	def testCommentsAndCDATAHideNoPages(self):
+		self.checkTrickyStory(StreamingStory(self.write('tricky.xml', TRICKY_STORY), 'tricky.xml'))
+
+	def testMarkupSplitAcrossChunks(self):
+		path = self.write('tricky.xml', TRICKY_STORY)
+		for chunkSize in (1, 2, 3, 7, 64):
+			StoryLoader.SCAN_CHUNK_SIZE = chunkSize
+			self.checkTrickyStory(StreamingStory(path, 'tricky.xml'))
+
+	def testPagesAreReadInTheFileEncodingWithItsEntities(self):
+		story = StreamingStory(self.write('latin1.xml', LATIN1_STORY), 'latin1.xml')
+		self.assertEqual(list(story.offsets), ['start'])
+		self.assertEqual(story.page('start').paragraphs, [(0, u'Café Renée')])
+
+	def testStoriesWhichCannotBeScannedAreReadWhole(self):
+		# The raw scan cannot see UTF-16 tags, so the page counts disagree.
+		data = TRICKY_STORY.decode('utf-8').replace('UTF-8', 'UTF-16').encode('utf-16')
+		path = self.write('utf16.xml', data)
+		with self.assertRaises(ValueError):
+			StreamingStory(path, 'utf16.xml')
+
+		storyPath, threshold, cache = Globals.STORY_PATH, Globals.STREAMING_THRESHOLD, Globals.STORY_CACHE
+		Globals.STORY_PATH, Globals.STREAMING_THRESHOLD, Globals.STORY_CACHE = self.folder, 0, False
+		try:
+			story = loadStory('utf16.xml')
+		finally:
+			Globals.STORY_PATH, Globals.STREAMING_THRESHOLD, Globals.STORY_CACHE = storyPath, threshold, cache
+		self.assertIs(type(story), Story)
+		self.assertEqual(story.page('end').paragraphs, [(0, 'The end.')])
+
+
+if __name__ == '__main__':
+	unittest.main()